@@ -1,13 +1,19 @@
+import os
 from flask import render_template
 from flask import Flask
 from flask_login import LoginManager
 from backend.database import db
-from backend.models import User
+from backend import database
+from backend.schema import upgrade_schema
+from backend import jobs
+from backend import identity
 from flask import redirect, url_for
 
 from backend.routes.dashboard import dashboard_bp
 from backend.routes.history import history_bp
 from backend.routes.uploads import upload_bp
+from backend.routes.metrics import metrics_bp
+from backend.routes.api import api_bp
 from backend.auth import auth_bp
 # app.register_blueprint(auth_bp)
 
@@ -15,23 +21,29 @@ def create_app():
     app = Flask(__name__)
     app.secret_key = "secret123"
 
-    # DB settings
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///data.db"
-    db.init_app(app)
+    # DB settings (GENERISK_DATABASE_URL, see backend/database.py)
+    database.init_app(app)
+
+    with app.app_context():
+        upgrade_schema()
+
+    # Background prediction jobs (started by the serving entry points, not here)
+    jobs.init_app(app)
 
     login = LoginManager()
     login.login_view = "auth.login"
     login.init_app(app)
 
-    @login.user_loader
-    def load_user(id):
-        return User.query.get(int(id))
+    # Served from the identity cache (backend/identity.py), not a query per request
+    login.user_loader(identity.load_user)
 
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(upload_bp)
     app.register_blueprint(history_bp)
     app.register_blueprint(dashboard_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(api_bp)
 
     @app.route("/")
     def home():
@@ -55,4 +67,7 @@ if __name__ == "__main__":
     app = create_app()
     with app.app_context():
         db.create_all()
+    # Only in the reloader's serving child, not in the process watching files
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        jobs.start_workers(app)
     app.run(debug=True)
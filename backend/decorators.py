@@ -1,5 +1,5 @@
 from functools import wraps
-from flask import abort
+from flask import abort, request, jsonify, g
 from flask_login import current_user
 
 def role_required(*roles):
@@ -12,4 +12,29 @@ def role_required(*roles):
                 abort(403)
             return f(*args, **kwargs)
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
+
+def token_required(*roles):
+    """
+    API authentication with an "Authorization: Bearer <token>" header
+    (see ApiToken). The token's user is available as ``g.api_user``.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            from backend.models import ApiToken
+
+            header = request.headers.get("Authorization", "")
+            if not header.startswith("Bearer "):
+                return jsonify({"error": "Missing bearer token"}), 401
+
+            user = ApiToken.authenticate(header[len("Bearer "):].strip())
+            if user is None:
+                return jsonify({"error": "Invalid or revoked token"}), 401
+            if roles and user.role not in roles:
+                return jsonify({"error": "Access denied"}), 403
+
+            g.api_user = user
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,60 @@
+import io
+from backend.models import Prediction
+
+# Parquet export of prediction rows (history, cohort results). pyarrow is
+# optional; without it the export views report that it is missing.
+EXPORT_BATCH_ROWS = 10_000
+
+EXPORT_COLUMNS = (
+    ("id", "int64"),
+    ("filename", "string"),
+    ("timestamp", "timestamp[us]"),
+    ("user_id", "int64"),
+    ("breast_prob", "float64"),
+    ("ovarian_prob", "float64"),
+    ("lung_prob", "float64"),
+    ("max_risk", "float64"),
+    ("high_risk", "bool"),
+    ("model_version", "string"),
+)
+
+
+def predictions_parquet(query, sample_name=None):
+    """
+    Parquet bytes of the predictions matched by ``query``, written in record
+    batches straight from a column-projected query (no ORM objects, no JSON).
+    ``sample_name(filename)`` adds a "sample" column (cohort exports).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow installed on the server")
+
+    names = [name for name, _ in EXPORT_COLUMNS]
+    fields = [pa.field(name, pa.type_for_alias(kind)) for name, kind in EXPORT_COLUMNS]
+    if sample_name is not None:
+        fields.insert(1, pa.field("sample", pa.string()))
+    schema = pa.schema(fields)
+
+    rows = query.with_entities(*(getattr(Prediction, name) for name in names)).yield_per(EXPORT_BATCH_ROWS)
+
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == EXPORT_BATCH_ROWS:
+                writer.write_batch(_record_batch(pa, schema, names, batch, sample_name))
+                batch = []
+        if batch:
+            writer.write_batch(_record_batch(pa, schema, names, batch, sample_name))
+
+    return buffer.getvalue()
+
+
+def _record_batch(pa, schema, names, rows, sample_name):
+    columns = dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+    if sample_name is not None:
+        columns["sample"] = [sample_name(f) for f in columns["filename"]]
+    return pa.record_batch([pa.array(list(columns[f.name]), type=f.type) for f in schema], schema=schema)
@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from backend.database import db
+from backend.models import User
+from backend import metrics
+
+# Flask-Login's user_loader runs on every authenticated request. It is served
+# from this per-process LRU of read-only user snapshots; entries expire after
+# GENERISK_IDENTITY_TTL seconds (bounding staleness across worker processes)
+# and are dropped in this process as soon as the User row changes.
+IDENTITY_CACHE_SIZE = int(os.environ.get("GENERISK_IDENTITY_CACHE_SIZE", 4096))
+IDENTITY_TTL = float(os.environ.get("GENERISK_IDENTITY_TTL", 60))
+
+
+# -------------------------------------------------------
+# Snapshot
+# -------------------------------------------------------
+class UserSnapshot(UserMixin):
+    """Immutable stand-in for ``current_user``: the columns pages read, nothing lazy."""
+
+    __slots__ = ("id", "name", "email", "role")
+
+    def __init__(self, id, name, email, role):
+        for field, value in zip(self.__slots__, (id, name, email, role)):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UserSnapshot is read-only")
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.id} {self.role}>"
+
+
+# -------------------------------------------------------
+# Cache
+# -------------------------------------------------------
+class IdentityCache:
+
+    def __init__(self, size=IDENTITY_CACHE_SIZE, ttl=IDENTITY_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user id -> (expires at, snapshot)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Snapshot of ``user_id``, loading it (one projected query) on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        row = (db.session.query(User.id, User.name, User.email, User.role)
+               .filter(User.id == user_id)
+               .first())
+        if row is None:
+            return None
+
+        snapshot = UserSnapshot(row.id, row.name, row.email, row.role)
+        if self.size > 0 and self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, snapshot)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+cache = IdentityCache()
+
+
+def load_user(user_id):
+    """Flask-Login user_loader."""
+    return cache.get(int(user_id))
+
+
+# -------------------------------------------------------
+# Invalidation: any ORM change to a User row (role, password, deletion)
+# -------------------------------------------------------
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    cache.invalidate(target.id)
+    # Again once committed, in case a concurrent request re-cached the old row
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_users", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _users_committed(session):
+    for user_id in session.info.pop("changed_users", ()):
+        cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _users_rolled_back(session):
+    session.info.pop("changed_users", None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_user_change(state):
+    # Query.update() / delete() on users skip the mapper events above
+    if (state.is_update or state.is_delete) and state.bind_mapper is not None and state.bind_mapper.class_ is User:
+        cache.clear()
+
+
+def _collect_identity_metrics():
+    stats = cache.stats()
+    return [
+        ("generisk_identity_cache_hits_total", "counter", "User loads served from the identity cache.", stats["hits"]),
+        ("generisk_identity_cache_misses_total", "counter", "User loads that queried the database.", stats["misses"]),
+        ("generisk_identity_cache_entries", "gauge", "Users in the identity cache.", stats["entries"]),
+    ]
+
+
+metrics.registry.register_collector(_collect_identity_metrics)
@@ -0,0 +1,231 @@
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+from backend.database import db
+from backend.models import Job, Prediction, RiskSummary, OverlapVocabulary
+from backend.metrics import STAGE_SECONDS, JOBS, ERRORS
+
+# Prediction jobs are rows in the Job table (the durable queue) executed by a
+# local thread pool; parsing and the model kernels release the GIL for most of
+# their runtime. JOB_WORKERS = 0 runs jobs inline in the request instead.
+#
+# A running job belongs to the process that claimed it (Job.owner) for as long
+# as that process renews its lease (Job.heartbeat_at) every JOB_LEASE_SECONDS / 3.
+# Only jobs whose lease has expired are taken over, so several web workers never
+# run the same job twice. create_app() only configures jobs (CLI scripts build
+# the app too); serving processes call start_workers().
+JOB_LEASE_SECONDS = float(os.environ.get("GENERISK_JOB_LEASE_SECONDS", 120))
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+# -------------------------------------------------------
+# Setup
+# -------------------------------------------------------
+def init_app(app):
+    """Job settings only; the pool starts with the first job (or ``start_workers``)."""
+    app.config.setdefault("JOB_WORKERS", int(os.environ.get("GENERISK_JOB_WORKERS", 2)))
+    app.config.setdefault("UPLOAD_FOLDER", os.path.join(app.instance_path, "uploads"))
+    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+
+
+def start_workers(app):
+    """
+    Entry point for processes that serve jobs (run_app.py, backend/wsgi.py):
+    start the pool and take over jobs a previous process left behind.
+    """
+    _workers(app)
+    resume_pending(app, every_queued=True)
+
+
+def _owner():
+    # Evaluated per call: gunicorn forks workers after importing the app
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _workers(app):
+    """This process's pool (and lease keeper), started on first use; None when jobs run inline."""
+    global _executor, _executor_pid
+
+    workers = app.config["JOB_WORKERS"]
+    if workers <= 0:
+        return None
+    with _lock:
+        # A forked child inherits the parent's pool object but none of its threads
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prediction-job")
+            _executor_pid = os.getpid()
+            threading.Thread(target=_keep_leases, args=(app,), name="prediction-job-lease", daemon=True).start()
+    return _executor
+
+
+def _keep_leases(app):
+    """Renew the leases of this process's running jobs; take over expired ones."""
+    interval = JOB_LEASE_SECONDS / 3
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                Job.query.filter_by(status="running", owner=_owner()).update({"heartbeat_at": datetime.utcnow()})
+                db.session.commit()
+            resume_pending(app)
+        except Exception:
+            logging.exception("Renewing prediction job leases failed")
+
+
+def resume_pending(app, every_queued=False):
+    """
+    Re-submit jobs whose process is gone: running jobs whose lease expired
+    and jobs queued for longer than a lease (``every_queued``: all queued
+    jobs, at startup). Nothing of an interrupted job
+    was committed, so it is queued again while its spooled upload exists,
+    failed otherwise. Claiming stays atomic, so a job still queued in a live
+    process's pool is run once either way.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    with app.app_context():
+        expired = Job.query.filter(
+            Job.status == "running",
+            db.or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < cutoff),
+        ).all()
+        requeued = []
+        for job in expired:
+            if job.path and os.path.exists(job.path):
+                changes = {"status": "queued", "started_at": None, "owner": None, "heartbeat_at": None}
+            else:
+                changes = {"status": "failed", "error": "Interrupted by a restart", "finished_at": datetime.utcnow()}
+            # Conditional on the lease we saw, in case another process took it over first
+            taken = Job.query.filter_by(id=job.id, status="running", heartbeat_at=job.heartbeat_at).update(changes)
+            if taken:
+                logging.warning(f"Prediction job {job.id} (owner {job.owner}) was interrupted; now {changes['status']}")
+                if changes["status"] == "queued":
+                    requeued.append(job.id)
+        db.session.commit()
+        queued = Job.query.filter_by(status="queued")
+        stale = (queued if every_queued else queued.filter(Job.created_at < cutoff)).all()
+    for job_id in dict.fromkeys(requeued + [j.id for j in stale]):
+        _dispatch(app, job_id)
+
+
+# -------------------------------------------------------
+# Submission
+# -------------------------------------------------------
+def submit_upload(app, file, user_id, cohort=False):
+    """Spool the uploaded file to disk, record a queued Job and dispatch it."""
+    name = secure_filename(file.filename) or "upload"
+    path = os.path.join(app.config["UPLOAD_FOLDER"], f"{uuid.uuid4().hex}_{name}")
+    file.save(path)
+
+    job = Job(filename=file.filename, path=path, cohort=bool(cohort), user_id=user_id)
+    db.session.add(job)
+    db.session.commit()
+
+    _dispatch(app, job.id)
+    return job
+
+
+def _dispatch(app, job_id):
+    executor = _workers(app)
+    if executor is None:
+        run_job(app, job_id)
+    else:
+        executor.submit(run_job, app, job_id)
+
+
+# -------------------------------------------------------
+# Execution
+# -------------------------------------------------------
+def _claim(job_id):
+    """Atomically move a job from queued to running under this process's lease; False if someone else did."""
+    now = datetime.utcnow()
+    claimed = Job.query.filter_by(id=job_id, status="queued").update(
+        {"status": "running", "started_at": now, "owner": _owner(), "heartbeat_at": now}
+    )
+    db.session.commit()
+    return claimed == 1
+
+
+def run_job(app, job_id):
+    # Imported here so web startup does not pull in the prediction stack
+    from backend.prediction.preprocess import preprocess_data, preprocess_cohort
+    from backend.prediction.run_predictions import run_predictions_batch
+    from backend.prediction.registry import registry
+
+    # The whole job (alignment, models, overlap encoding) runs on one model
+    # version, even if a new one is swapped in meanwhile
+    with app.app_context(), registry.use():
+        if not _claim(job_id):
+            return
+
+        job = Job.query.get(job_id)
+        stage = "parse"
+        try:
+            with STAGE_SECONDS.time(stage="parse"), open(job.path, "rb") as stream:
+                upload = FileStorage(stream=stream, filename=job.filename)
+                processed = preprocess_cohort(upload) if job.cohort else preprocess_data(upload)
+
+            stage = "predict"
+            with STAGE_SECONDS.time(stage="predict"):
+                rows, shared = run_predictions_batch(processed)
+
+            stage = "persist"
+            with STAGE_SECONDS.time(stage="persist"):
+                write_predictions(job, processed.samples, rows, shared)
+
+            job.status = "done"
+            job.sample_count = len(rows)
+
+        except Exception as e:
+            db.session.rollback()
+            job = Job.query.get(job_id)
+            job.status = "failed"
+            job.error = str(e)
+            ERRORS.inc(stage=stage)
+            logging.exception(f"Prediction job {job_id} failed")
+
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        JOBS.inc(status=job.status)
+
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+
+
+def write_predictions(job, samples, rows, shared):
+    """Insert one Prediction per sample of ``job`` (not committed)."""
+    from backend.prediction.registry import registry
+    from backend.prediction import overlap
+
+    # Matched genes as compressed bits over the features each model can match
+    features = {name: entry.plan.candidates.tolist() for name, entry in registry.items()}
+    version = overlap.vocabulary_version(features)
+    OverlapVocabulary.ensure(version, features)
+    shared_bits = overlap.encode(shared, features)
+
+    # One Prediction per sample, inserted in bulk with its risk columns
+    mappings = [
+        {
+            "filename": f"{job.filename} [{sample}]" if job.cohort else job.filename,
+            "results_json": Prediction.results_extra(results),
+            "shared_bits": shared_bits,
+            "overlap_version": version,
+            "model_version": registry.version(),
+            "user_id": job.user_id,
+            "job_id": job.id,
+            **Prediction.risk_columns(results),
+        }
+        for sample, results in zip(samples, rows)
+    ]
+    db.session.bulk_insert_mappings(Prediction, mappings)
+    RiskSummary.record(mappings)
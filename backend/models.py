@@ -1,22 +1,210 @@
 from backend.database import db
 from flask_login import UserMixin
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+import json
+import hashlib
+import secrets
+
+# A prediction is high risk when any cancer probability reaches this (%)
+HIGH_RISK_THRESHOLD = 70
+CANCER_TYPES = ("breast", "ovarian", "lung")
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(60))
     email = db.Column(db.String(80), unique=True)
     password = db.Column(db.String(200))
-    role = db.Column(db.String(20))  # admin/doctor/researcher/user
+    role = db.Column(db.String(20), index=True)  # admin/doctor/researcher/user
 
 class Prediction(db.Model):
+    __table_args__ = (
+        # History pages: keyset pagination on (timestamp, id), per user or global
+        db.Index("ix_prediction_user_timestamp", "user_id", "timestamp"),
+        db.Index("ix_prediction_timestamp", "timestamp"),
+        # ?cancer= / ?min_risk= filters on one cancer's probability
+        db.Index("ix_prediction_breast_prob_timestamp", "breast_prob", "timestamp"),
+        db.Index("ix_prediction_ovarian_prob_timestamp", "ovarian_prob", "timestamp"),
+        db.Index("ix_prediction_lung_prob_timestamp", "lung_prob", "timestamp"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(200))
-    results_json = db.Column(db.Text)
-    shared_json = db.Column(db.Text)
+    results_json = db.Column(db.Text)  # only outcomes the risk columns cannot hold
+    shared_json = db.deferred(db.Column(db.Text))  # legacy rows; new rows use shared_bits
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    job_id = db.Column(db.Integer, db.ForeignKey("job.id"), index=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Risk scores extracted from results_json when the row is written
+    breast_prob = db.Column(db.Float)
+    ovarian_prob = db.Column(db.Float)
+    lung_prob = db.Column(db.Float)
+    max_risk = db.Column(db.Float, index=True)
+    high_risk = db.Column(db.Boolean, default=False, index=True)
+
+    # Matched genes as compressed bits over an OverlapVocabulary version,
+    # loaded only when a page actually shows them
+    shared_bits = db.deferred(db.Column(db.LargeBinary))
+    overlap_version = db.Column(db.String(16))
+
+    # Model version (registry manifest) that produced the scores
+    model_version = db.Column(db.String(64), index=True)
+
+    @staticmethod
+    def results_extra(results):
+        """results_json payload: the non-numeric outcomes, None if there are none."""
+        extra = {k: v for k, v in results.items() if not isinstance(v, (int, float))}
+        return json.dumps(extra) if extra else None
+
+    def results(self):
+        """Per-cancer results from the risk columns plus any non-numeric outcomes."""
+        extra = json.loads(self.results_json) if self.results_json else {}
+        results = {}
+        for c in CANCER_TYPES:
+            value = getattr(self, f"{c}_prob")
+            if value is not None:
+                results[c] = value
+            elif c in extra:
+                results[c] = extra[c]
+        return results
+
+    def shared_genes(self):
+        """Matched genes per cancer, decoded on demand."""
+        if self.shared_bits is not None:
+            from backend.prediction.overlap import decode
+            return decode(self.shared_bits, OverlapVocabulary.features(self.overlap_version))
+        return json.loads(self.shared_json) if self.shared_json else {}
+
+    @staticmethod
+    def risk_columns(results):
+        """Numeric risk columns for a results dict (non-numeric entries -> NULL)."""
+        probs = {
+            c: float(results[c]) if isinstance(results.get(c), (int, float)) else None
+            for c in CANCER_TYPES
+        }
+        scores = [v for v in probs.values() if v is not None]
+        max_risk = max(scores) if scores else None
+        return {
+            "breast_prob": probs["breast"],
+            "ovarian_prob": probs["ovarian"],
+            "lung_prob": probs["lung"],
+            "max_risk": max_risk,
+            "high_risk": max_risk is not None and max_risk >= HIGH_RISK_THRESHOLD,
+        }
+
+class OverlapVocabulary(db.Model):
+    # Model feature lists that Prediction.shared_bits refer to, one row per version
+    version = db.Column(db.String(16), primary_key=True)
+    features_json = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    _features = {}  # version -> {disease: [feature names]}, never changes once written
+
+    @classmethod
+    def ensure(cls, version, features):
+        """Store the feature lists for ``version`` unless they already are."""
+        if version in cls._features:
+            return
+        if cls.query.get(version) is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cls(version=version, features_json=json.dumps(features)))
+            except IntegrityError:
+                pass  # another worker stored the same version first
+        cls._features[version] = features
+
+    @classmethod
+    def features(cls, version):
+        if version not in cls._features:
+            row = cls.query.get(version)
+            if row is None:
+                raise ValueError(f"Unknown gene overlap vocabulary {version}")
+            cls._features[version] = json.loads(row.features_json)
+        return cls._features[version]
+
+class RiskSummary(db.Model):
+    # Single row, updated in the same transaction as every Prediction insert
+    id = db.Column(db.Integer, primary_key=True)
+    total_predictions = db.Column(db.Integer, default=0, nullable=False)
+    high_risk_count = db.Column(db.Integer, default=0, nullable=False)
+
+    @classmethod
+    def record(cls, rows):
+        """Add a batch of Prediction mappings (with risk columns) to the totals."""
+        high = sum(1 for r in rows if r.get("high_risk"))
+        changes = {
+            cls.total_predictions: cls.total_predictions + len(rows),
+            cls.high_risk_count: cls.high_risk_count + high,
+        }
+        if cls.query.filter_by(id=1).update(changes):
+            return
+
+        # No row yet (upgrade_schema seeds it): create it, unless another
+        # worker just did, in which case add to theirs
+        try:
+            with db.session.begin_nested():
+                db.session.add(cls(id=1, total_predictions=len(rows), high_risk_count=high))
+        except IntegrityError:
+            cls.query.filter_by(id=1).update(changes)
+
+    @classmethod
+    def current(cls):
+        return cls.query.get(1) or cls(id=1, total_predictions=0, high_risk_count=0)
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), index=True)
+    filename = db.Column(db.String(200))
+    path = db.Column(db.String(500))  # spooled upload, removed once processed
+    cohort = db.Column(db.Boolean, default=False)
+    status = db.Column(db.String(20), default="queued", index=True)  # queued/running/done/failed
+    error = db.Column(db.Text)
+    sample_count = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    owner = db.Column(db.String(100))  # host:pid of the process running it
+    heartbeat_at = db.Column(db.DateTime)  # renewed by the owner while running (its lease)
+
+class ApiToken(db.Model):
+    # Bearer tokens for the prediction API; only a sha256 of the token is stored
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), index=True)
+    name = db.Column(db.String(100))
+    token_hash = db.Column(db.String(64), unique=True, index=True)
+    prefix = db.Column(db.String(12))  # first characters, to tell tokens apart
+    revoked = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime)
+
+    @staticmethod
+    def _hash(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def issue(cls, user, name=None):
+        """Create a token for ``user``; returns (ApiToken, plain token shown once)."""
+        token = "grk_" + secrets.token_urlsafe(32)
+        row = cls(user_id=user.id, name=name, token_hash=cls._hash(token), prefix=token[:12])
+        db.session.add(row)
+        db.session.commit()
+        return row, token
+
+    @classmethod
+    def authenticate(cls, token):
+        """User owning an active ``token``, or None."""
+        row = cls.query.filter_by(token_hash=cls._hash(token), revoked=False).first()
+        if row is None:
+            return None
+
+        # Record usage at most once a minute, not on every request
+        now = datetime.utcnow()
+        if row.last_used_at is None or now - row.last_used_at > timedelta(minutes=1):
+            row.last_used_at = now
+            db.session.commit()
+        return User.query.get(row.user_id)
+
 class DoctorNote(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     prediction_id = db.Column(db.Integer)
@@ -27,8 +215,8 @@ class DoctorNote(db.Model):
 class SharedReport(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     prediction_id = db.Column(db.Integer, db.ForeignKey("prediction.id"))
-    from_user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
-    to_user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    from_user_id = db.Column(db.Integer, db.ForeignKey("user.id"), index=True)
+    to_user_id = db.Column(db.Integer, db.ForeignKey("user.id"), index=True)
     message = db.Column(db.Text)
     status = db.Column(db.String(20), default="pending")  # pending/viewed/replied
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,178 @@
+import os
+import sys
+import gzip
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from backend.prediction.genes import MODELS_DIR
+
+# Prebuilt alias -> approved symbol index (from the HGNC complete set:
+# previous symbols, alias symbols, Ensembl / Entrez / HGNC IDs). Built once
+# with ``python -m backend.prediction.aliases build hgnc_complete_set.txt``;
+# uploads are resolved against it with one hash lookup, never by matching.
+ALIAS_INDEX_PATH = Path(os.environ.get("GENERISK_ALIAS_INDEX", MODELS_DIR / "alias_index.npz"))
+
+# HGNC complete-set columns; list fields are "|"-separated
+SYMBOL_COLUMN = "symbol"
+ID_COLUMNS = ["hgnc_id", "ensembl_gene_id", "entrez_id"]
+PREVIOUS_COLUMN = "prev_symbol"
+ALIAS_COLUMN = "alias_symbol"
+LIST_SEP = "|"
+
+# Accession version suffixes (ENSG00000141510.17, NM_000546.6) are ignored
+VERSION_SUFFIX = r"^([A-Z]+_?\d+)\.\d+$"
+
+# Ambiguous keys resolve to the most specific kind only
+KIND_ID, KIND_PREVIOUS, KIND_ALIAS = 0, 1, 2
+
+
+def strip_versions(names):
+    """Upper-case names with accession version suffixes removed."""
+    return pd.Index(np.asarray(names, dtype=object)).astype(str).str.strip().str.upper() \
+        .str.replace(VERSION_SUFFIX, r"\1", regex=True)
+
+
+# ============================================================
+# Alias index
+# ============================================================
+class AliasIndex:
+    """
+    keys    - every known alias / ID, upper case, unversioned
+    codes   - key i resolves to symbols[codes[i]]
+    symbols - approved upper-case gene symbols
+    """
+
+    def __init__(self, keys, codes, symbols, source=""):
+        self.keys = pd.Index(np.asarray(keys, dtype=object))
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.symbols = np.asarray(symbols, dtype=object)
+        self.source = str(source)
+        self._vocab_map = (None, None)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _symbol_positions(self, vocab):
+        """Vocabulary position of every approved symbol, computed once per vocabulary."""
+        cached_vocab, symbol_pos = self._vocab_map
+        if cached_vocab is not vocab:
+            symbol_pos = np.append(vocab._lookup(self.symbols.tolist()), -1)
+            self._vocab_map = (vocab, symbol_pos)
+        return symbol_pos
+
+    def positions(self, names, vocab):
+        """Vocabulary position each alias resolves to, -1 where it resolves to none."""
+        idx = self.keys.get_indexer(strip_versions(names))
+        codes = np.where(idx >= 0, self.codes[idx], -1)
+        return self._symbol_positions(vocab)[codes]
+
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            keys=self.keys.to_numpy().astype("S"),
+            codes=self.codes,
+            symbols=self.symbols.astype("S"),
+            source=np.asarray(self.source),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(np.char.decode(data["keys"], "utf-8"), data["codes"],
+                       np.char.decode(data["symbols"], "utf-8"), data["source"].item())
+
+
+# ============================================================
+# Building the index from the HGNC complete set
+# ============================================================
+def read_hgnc(path):
+    """(key, symbol, kind) rows of an HGNC complete-set TSV (plain or .gz), approved genes only."""
+    path = Path(path)
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8", errors="ignore") as f:
+        header = f.readline().rstrip("\n").split("\t")
+        if SYMBOL_COLUMN not in header:
+            raise ValueError(f"'{SYMBOL_COLUMN}' column not found in {path}")
+        wanted = [c for c in [SYMBOL_COLUMN, "status", PREVIOUS_COLUMN, ALIAS_COLUMN] + ID_COLUMNS if c in header]
+        df = pd.read_csv(f, sep="\t", header=None, names=header, usecols=wanted, dtype=str, engine="c")
+
+    if "status" in df.columns:
+        df = df[df["status"].fillna("Approved") == "Approved"]
+
+    frames = []
+    for column, kind in [(c, KIND_ID) for c in ID_COLUMNS] + [(PREVIOUS_COLUMN, KIND_PREVIOUS), (ALIAS_COLUMN, KIND_ALIAS)]:
+        if column not in df.columns:
+            continue
+        pairs = df[[column, SYMBOL_COLUMN]].dropna()
+        keys = pairs[column].str.replace('"', "", regex=False).str.split(LIST_SEP)
+        frames.append(pd.DataFrame({"key": keys, "symbol": pairs[SYMBOL_COLUMN], "kind": kind}).explode("key"))
+
+    rows = pd.concat(frames, ignore_index=True).dropna()
+    return rows, df[SYMBOL_COLUMN].dropna()
+
+
+def build_alias_index(path):
+    """
+    AliasIndex from an HGNC complete set. Keys that are themselves approved
+    symbols are left out (they name a different gene); a key claimed by
+    several genes keeps only its most specific kind, and is dropped if that
+    is still ambiguous.
+    """
+    rows, approved = read_hgnc(path)
+    approved = strip_versions(approved)
+
+    rows["key"] = strip_versions(rows["key"])
+    rows["symbol"] = strip_versions(rows["symbol"])
+    rows = rows[(rows["key"] != "") & ~rows["key"].isin(approved)].drop_duplicates(["key", "symbol"])
+
+    rows = rows[rows["kind"] == rows.groupby("key")["kind"].transform("min")]
+    ambiguous = rows["key"].duplicated(keep=False)
+    if ambiguous.any():
+        logging.info(f"{rows.loc[ambiguous, 'key'].nunique()} ambiguous aliases dropped")
+    rows = rows[~ambiguous].sort_values("key")
+
+    codes, symbols = pd.factorize(rows["symbol"], sort=True)
+    return AliasIndex(rows["key"].to_numpy(), codes, np.asarray(symbols, dtype=object), Path(path).name)
+
+
+# ============================================================
+# Loading (once per process)
+# ============================================================
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_alias_index(path=ALIAS_INDEX_PATH):
+    """The prebuilt AliasIndex, or None if it has not been built."""
+    global _index, _index_mtime
+
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _index_lock:
+        if _index is None or mtime != _index_mtime:
+            _index = AliasIndex.load(path)
+            _index_mtime = mtime
+            logging.info(f"Alias index loaded: {len(_index)} aliases -> {len(_index.symbols)} genes ({_index.source})")
+        return _index
+
+
+if __name__ == "__main__":
+    # python -m backend.prediction.aliases build hgnc_complete_set.txt[.gz]
+    #   -> write backend/models/alias_index.npz (GENERISK_ALIAS_INDEX overrides)
+    if len(sys.argv) != 3 or sys.argv[1] != "build":
+        print("usage: python -m backend.prediction.aliases build <hgnc_complete_set.txt>")
+        sys.exit(1)
+
+    index = build_alias_index(sys.argv[2])
+    index.save(ALIAS_INDEX_PATH)
+    print(f"✅ {ALIAS_INDEX_PATH.name}: {len(index)} aliases -> {len(index.symbols)} genes")
@@ -0,0 +1,194 @@
+import logging
+import numpy as np
+import pandas as pd
+
+# How model feature names are matched against the (upper-cased) vocabulary.
+# "exact": only features already spelled in upper case can match, as with the
+# original per-request reindex; mixed-case names such as C2orf83 never do.
+# Part of the bundle header and the prediction cache key.
+FEATURE_MATCHING = "exact"
+
+
+# ============================================================
+# Gene vocabulary
+# ============================================================
+class GeneVocabulary:
+    """
+    Ordered, de-duplicated upper-case gene symbols backed by a hash index.
+
+    Every aligned sample is a float32 vector over this vocabulary plus one
+    trailing padding slot that is always 0, so genes a model expects but the
+    vocabulary does not know simply gather the padding value.
+
+    ``aliases`` (an ``AliasIndex``) resolves names without an exact match,
+    e.g. previous HGNC symbols or Ensembl / Entrez IDs.
+    """
+
+    aliases = None
+
+    def __init__(self, genes):
+        symbols = [str(g).strip().upper() for g in genes]
+        self.genes = pd.Index(list(dict.fromkeys(s for s in symbols if s)))
+        self.pad = len(self.genes)
+
+    def __len__(self):
+        return len(self.genes)
+
+    def positions(self, names):
+        """Vocabulary position of every name, -1 where the name is unknown."""
+        return self.resolve(names)[0]
+
+    def resolve(self, names):
+        """(vocabulary positions, mask of names resolved through an alias)."""
+        # Normalise each distinct name once; long uploads repeat symbols a lot
+        codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+        found = self._lookup([str(n).strip().upper() for n in uniques])
+        via_alias = np.zeros(len(found), dtype=bool)
+
+        missing = np.flatnonzero(found < 0)
+        if self.aliases is not None and missing.size:
+            found[missing] = self.aliases.positions(uniques[missing], self)
+            via_alias[missing] = found[missing] >= 0
+
+        return np.append(found, -1)[codes], np.append(via_alias, False)[codes]
+
+    def _lookup(self, normalised):
+        """Positions of already normalised, distinct names (-1 if unknown)."""
+        return self.genes.get_indexer(pd.Index(normalised))
+
+    def align(self, df):
+        """
+        Scatter the columns of ``df`` (samples x genes) into one float32
+        matrix of shape (n_samples, len(vocab) + 1).
+        """
+        if df is None or df.empty:
+            raise ValueError("Input DataFrame is empty or None")
+
+        return self.align_matrix(df.columns, df, samples=[str(i) for i in df.index])
+
+    def align_matrix(self, genes, values, samples=None):
+        """
+        Same as ``align`` for columnar input: ``genes`` names the columns of
+        ``values`` (samples x genes, array or DataFrame).
+        """
+        pos, via_alias = self.resolve(genes)
+
+        # One column per vocabulary gene: exact matches before aliases, then
+        # the first occurrence; unknown genes are dropped
+        order = np.lexsort((np.arange(len(pos)), via_alias))
+        first = order[~pd.Index(pos[order]).duplicated() & (pos[order] >= 0)]
+        keep = np.zeros(len(pos), dtype=bool)
+        keep[first] = True
+
+        if not keep.any():
+            raise ValueError(f"No matching genes found. Available: {len(genes)}, Required: {len(self)}")
+
+        columns = np.flatnonzero(keep)
+        if isinstance(values, pd.DataFrame):
+            selected = values.iloc[:, columns].to_numpy(dtype=np.float32)
+        else:
+            selected = np.asarray(values, dtype=np.float32)[:, columns]
+
+        aligned = np.zeros((selected.shape[0], self.pad + 1), dtype=np.float32)
+        aligned[:, pos[keep]] = selected
+
+        present = np.zeros(self.pad + 1, dtype=bool)
+        present[pos[keep]] = True
+        aliased = np.zeros(self.pad + 1, dtype=bool)
+        aliased[pos[keep & via_alias]] = True
+
+        return AlignedSample(aligned, present, samples=samples, aliased=aliased)
+
+
+# ============================================================
+# Aligned sample(s)
+# ============================================================
+class AlignedSample:
+    """
+    Expression values scattered onto a ``GeneVocabulary``.
+
+    values  - float32 array (n_samples, len(vocab) + 1), last column is padding
+    present - bool mask (len(vocab) + 1,) of genes the upload actually provided
+    samples - sample labels, one per row of ``values``
+    aliased - bool mask of the present genes that were matched through an alias
+    """
+
+    def __init__(self, values, present, samples=None, aliased=None):
+        self.values = values
+        self.present = present
+        self.samples = samples if samples is not None else [str(i) for i in range(len(values))]
+        self.aliased = aliased if aliased is not None else np.zeros_like(present)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def n_genes(self):
+        return int(self.present.sum())
+
+    @property
+    def n_aliased(self):
+        return int(self.aliased.sum())
+
+
+# ============================================================
+# Per-model alignment plan
+# ============================================================
+class ModelPlan:
+    """
+    Precompiled mapping from a model's ``feature_names_in_`` to vocabulary
+    positions. Building a model input is a single fancy-index gather.
+
+    ``used`` optionally lists the feature indices the model splits on; every
+    other feature gathers the zero padding slot (it cannot change the output).
+    """
+
+    def __init__(self, name, feature_names, vocab, used=None):
+        self.name = name
+        self.feature_names = np.asarray(feature_names, dtype=object)
+
+        pos = vocab.positions(self.feature_names)
+        if FEATURE_MATCHING == "exact":
+            pos = np.where([str(f) == str(f).upper() for f in self.feature_names], pos, -1)
+        if used is not None:
+            in_use = np.zeros(len(pos), dtype=bool)
+            in_use[used] = True
+            pos = np.where(in_use, pos, -1)
+        self.known = pos >= 0
+        self.gather = np.where(self.known, pos, vocab.pad).astype(np.intp)
+
+        dupes = pd.Index(self.feature_names).duplicated().sum()
+        logging.info(f"{name} plan - {int(self.known.sum())}/{len(self.feature_names)} features in vocabulary, {dupes} duplicates")
+
+    @classmethod
+    def from_arrays(cls, name, feature_names, gather, known):
+        """Plan with precomputed ``gather`` / ``known`` arrays (e.g. from a model bundle)."""
+        plan = cls.__new__(cls)
+        plan.name = name
+        plan.feature_names = np.asarray(feature_names, dtype=object)
+        plan.gather = gather
+        plan.known = known
+        return plan
+
+    def __len__(self):
+        return len(self.feature_names)
+
+    def take(self, aligned):
+        """Model input matrix (n_samples, n_features) in training order."""
+        return aligned.values[:, self.gather]
+
+    def overlap_mask(self, aligned):
+        """Boolean mask over the model's features that the upload provided."""
+        return aligned.present[self.gather]
+
+    @property
+    def candidates(self):
+        """Feature names an upload can match at all (in the vocabulary, in use)."""
+        return self.feature_names[self.known]
+
+    def matched(self, aligned):
+        return self.feature_names[self.overlap_mask(aligned)].tolist()
+
+    def n_aliased(self, aligned):
+        """How many of the matched features the upload named through an alias."""
+        return int(aligned.aliased[self.gather].sum())
@@ -0,0 +1,225 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from backend.prediction.alignment import GeneVocabulary, ModelPlan, FEATURE_MATCHING
+from backend.prediction.forest import CompiledForest
+
+# Single-file artifact bundle that every worker process memory-maps:
+#   - the gene vocabulary as a sorted fixed-width string table plus an
+#     open-addressing hash index (FNV-1a) into it
+#   - per model: the compiled, feature-pruned forest arrays, its feature
+#     names and its precomputed alignment plan (gather positions)
+# Pages are shared through the OS page cache, so N workers cost one copy and
+# start without unpickling forests or parsing gene JSON.
+#
+# Layout: b"GRKBUNDL" | uint64 header length | JSON header | arrays, each
+# 64-byte aligned at the offsets listed in the header.
+MAGIC = b"GRKBUNDL"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+
+
+def _fnv1a(codes):
+    """FNV-1a 64 of every row of a (n, width) uint8 matrix."""
+    h = np.full(codes.shape[0], FNV_OFFSET, dtype=np.uint64)
+    for j in range(codes.shape[1]):
+        h ^= codes[:, j].astype(np.uint64)
+        h *= FNV_PRIME
+    return h
+
+
+def _padded(names, width):
+    """(fixed-width bytes array, mask of names that fit) for ``names``."""
+    encoded = [str(n).encode("utf-8") for n in names]
+    fits = np.fromiter((0 < len(b) <= width for b in encoded), dtype=bool, count=len(encoded))
+    table = np.array([b if ok else b"" for b, ok in zip(encoded, fits)], dtype=f"S{width}")
+    return table, fits
+
+
+# ============================================================
+# Vocabulary backed by the mapped string table
+# ============================================================
+class BundleVocabulary(GeneVocabulary):
+    """
+    GeneVocabulary over a sorted string table and hash index living in the
+    bundle's memory map. Positions are indices into the sorted table; the
+    Python ``genes`` index is only materialised if something asks for it.
+    """
+
+    def __init__(self, names, slots, max_probe):
+        self.names = names
+        self.slots = slots
+        self.mask = np.uint64(len(slots) - 1)
+        self.max_probe = int(max_probe)
+        self.width = names.dtype.itemsize
+        self.pad = len(names)
+        self._genes = None
+
+    def __len__(self):
+        return self.pad
+
+    @property
+    def genes(self):
+        if self._genes is None:
+            self._genes = pd.Index(np.char.decode(self.names, "utf-8").astype(object))
+        return self._genes
+
+    def _lookup(self, normalised):
+        queries, fits = _padded(normalised, self.width)
+        found = np.full(len(queries), -1, dtype=np.intp)
+        if not len(queries):
+            return found
+
+        codes = queries.view(np.uint8).reshape(len(queries), self.width)
+        slot = (_fnv1a(codes) & self.mask).astype(np.intp)
+        pending = np.flatnonzero(fits)
+
+        # Linear probing, all pending names one step at a time
+        for _ in range(self.max_probe):
+            if not pending.size:
+                break
+            candidate = self.slots[slot[pending]]
+            occupied = candidate >= 0
+            hit = occupied & (self.names[np.maximum(candidate, 0)] == queries[pending])
+            found[pending[hit]] = candidate[hit]
+
+            pending = pending[occupied & ~hit]
+            slot[pending] = (slot[pending] + 1) & int(self.mask)
+        return found
+
+
+def _hash_index(names):
+    """Open-addressing table (size: power of two >= 2n) of positions into ``names``."""
+    size = 1 << max(int(np.ceil(np.log2(max(2 * len(names), 2)))), 1)
+    slots = np.full(size, -1, dtype=np.int32)
+    codes = names.view(np.uint8).reshape(len(names), names.dtype.itemsize)
+    start = (_fnv1a(codes) & np.uint64(size - 1)).astype(np.intp)
+
+    max_probe = 1
+    for position, slot in enumerate(start):
+        probe = 1
+        while slots[slot] >= 0:
+            slot = (slot + 1) & (size - 1)
+            probe += 1
+        slots[slot] = position
+        max_probe = max(max_probe, probe)
+    return slots, max_probe
+
+
+def source_fingerprint(paths):
+    """Name, size and mtime of the files a bundle was built from."""
+    parts = []
+    for path in map(Path, paths):
+        if path.exists():
+            st = path.stat()
+            parts.append(f"{path.name}:{st.st_size}:{st.st_mtime_ns}")
+    return ";".join(parts)
+
+
+# ============================================================
+# Writing
+# ============================================================
+def write_bundle(path, models, source_fingerprint=""):
+    """
+    Write ``models`` ({name: pruned CompiledForest}) and the sorted union of
+    their features as one bundle file at ``path`` (atomically).
+    """
+    genes = sorted({str(g).strip().upper() for m in models.values() for g in m.feature_names_in_})
+    width = max((len(g.encode("utf-8")) for g in genes), default=1)
+    names, _ = _padded(genes, width)
+    slots, max_probe = _hash_index(names)
+    vocab = BundleVocabulary(names, slots, max_probe)
+
+    arrays = {"vocab/names": names, "vocab/slots": slots}
+    meta = {"models": {}, "vocab": {"max_probe": max_probe, "size": len(genes)}, "matching": FEATURE_MATCHING}
+
+    for name, forest in models.items():
+        plan = ModelPlan(name, forest.feature_names_in_, vocab)
+        for key in CompiledForest.ARRAYS:
+            value = getattr(forest, key)
+            arrays[f"{name}/{key}"] = value.astype(str) if value.dtype == object else value
+        arrays[f"{name}/feature_names"] = np.asarray(forest.feature_names_in_).astype(str)
+        arrays[f"{name}/gather"] = plan.gather
+        arrays[f"{name}/known"] = plan.known
+        meta["models"][name] = {"max_depth": forest.max_depth, "n_features_in": forest.n_features_in_}
+
+    header = {"format": FORMAT_VERSION, "source": source_fingerprint, "meta": meta, "arrays": {}}
+    offset = 0
+    for key, value in arrays.items():
+        value = np.ascontiguousarray(value)
+        arrays[key] = value
+        header["arrays"][key] = {"dtype": value.dtype.str, "shape": list(value.shape), "offset": offset}
+        offset += -(-value.nbytes // ALIGNMENT) * ALIGNMENT
+
+    blob = json.dumps(header).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(blob)) // ALIGNMENT) * ALIGNMENT
+
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(blob)).tobytes())
+        f.write(blob)
+        for key, value in arrays.items():
+            f.seek(data_start + header["arrays"][key]["offset"])
+            f.write(value.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+    return path
+
+
+# ============================================================
+# Loading
+# ============================================================
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(length))
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format {header.get('format')} in {path}")
+    header["data_start"] = -(-(len(MAGIC) + 8 + length) // ALIGNMENT) * ALIGNMENT
+    return header
+
+
+def load_bundle(path, header=None):
+    """(BundleVocabulary, {name: (CompiledForest, ModelPlan)}), all arrays mapped read-only."""
+    header = header or read_header(path)
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+
+    def array(key):
+        spec = header["arrays"][key]
+        return np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=mapped,
+                          offset=header["data_start"] + spec["offset"])
+
+    meta = header["meta"]
+    vocab = BundleVocabulary(array("vocab/names"), array("vocab/slots"), meta["vocab"]["max_probe"])
+
+    models = {}
+    for name, info in meta["models"].items():
+        feature_names = array(f"{name}/feature_names")
+        forest = CompiledForest(
+            feature=array(f"{name}/feature"),
+            threshold=array(f"{name}/threshold"),
+            left=array(f"{name}/left"),
+            right=array(f"{name}/right"),
+            missing_left=array(f"{name}/missing_left"),
+            value=array(f"{name}/value"),
+            roots=array(f"{name}/roots"),
+            max_depth=info["max_depth"],
+            classes=array(f"{name}/classes_"),
+            feature_names_in=feature_names,
+        )
+        forest.n_features_in_ = info["n_features_in"]
+        plan = ModelPlan.from_arrays(name, forest.feature_names_in_, array(f"{name}/gather"), array(f"{name}/known"))
+        models[name] = (forest, plan)
+
+    logging.info(f"Loaded model bundle {Path(path).name}: {len(vocab)} genes, {len(models)} models (mmap)")
+    return vocab, models
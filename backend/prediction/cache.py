@@ -0,0 +1,247 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from backend.prediction.registry import registry, MODEL_DIR
+from backend.prediction.alignment import FEATURE_MATCHING
+from backend import metrics
+
+# Two-tier, content-addressed cache of prediction results:
+# - an in-process LRU (GENERISK_CACHE_SIZE entries)
+# - a SQLite file shared by every worker (GENERISK_CACHE_PATH, "" disables it)
+CACHE_ENABLED = os.environ.get("GENERISK_CACHE", "1") != "0"
+CACHE_SIZE = int(os.environ.get("GENERISK_CACHE_SIZE", 4096))
+CACHE_PATH = os.environ.get(
+    "GENERISK_CACHE_PATH", str(MODEL_DIR.parent.parent / "instance" / "prediction_cache.db")
+)
+
+# Disk entries unused for this long are evicted (swept at most every
+# CACHE_SWEEP_SECONDS). Keys include the model fingerprint, so entries of
+# other versions are never served; they only expire, which lets workers on
+# the old and new version share the file during a hot swap.
+CACHE_TTL_SECONDS = float(os.environ.get("GENERISK_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+CACHE_SWEEP_SECONDS = float(os.environ.get("GENERISK_CACHE_SWEEP_SECONDS", 3600))
+
+# Anything in the models directory that changes predictions or overlaps
+FINGERPRINT_SUFFIXES = (".pkl", ".json", ".npz", ".bundle")
+
+
+# -------------------------------------------------------
+# Model fingerprint
+# -------------------------------------------------------
+def model_fingerprint(model_dir=MODEL_DIR):
+    """
+    Hash of every model/gene artifact (name, size, mtime) plus the model
+    version in use and the registry settings that change outputs. Any
+    retrained .pkl, edited gene JSON or version swap produces a new
+    fingerprint and therefore new cache keys.
+    """
+    h = hashlib.sha256()
+    for path in sorted(Path(model_dir).iterdir()):
+        if path.suffix in FINGERPRINT_SUFFIXES:
+            st = path.stat()
+            h.update(f"{path.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    h.update(f"version={registry.version()};prune={registry.prune};matching={FEATURE_MATCHING}".encode())
+    return h.hexdigest()[:16]
+
+
+# -------------------------------------------------------
+# Cache
+# -------------------------------------------------------
+class PredictionCache:
+    """
+    Keys are sha256 digests of the aligned float32 expression row plus the
+    presence mask and the model fingerprint, so identical uploads hit no
+    matter how the file was formatted. Per-sample ``results`` and the
+    upload's ``shared_genes`` (which only depend on the presence mask) are
+    stored under separate keys.
+    """
+
+    def __init__(self, size=CACHE_SIZE, path=CACHE_PATH, model_dir=MODEL_DIR, ttl=CACHE_TTL_SECONDS):
+        self.size = size
+        self.path = path or None
+        self.model_dir = model_dir
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._fingerprint = None
+        self._next_sweep = 0.0
+
+    # ---------------------------------------------------
+    # Keys
+    # ---------------------------------------------------
+    def fingerprint(self):
+        fp = model_fingerprint(self.model_dir)
+        if fp != self._fingerprint:
+            if self._fingerprint is not None:
+                logging.info(f"Model fingerprint changed ({self._fingerprint} -> {fp}), new prediction cache keys")
+            self._fingerprint = fp
+        return fp
+
+    def sample_keys(self, aligned, fingerprint):
+        base = hashlib.sha256(fingerprint.encode())
+        base.update(aligned.present.tobytes())
+        keys = []
+        for row in aligned.values:
+            h = base.copy()
+            h.update(row.tobytes())
+            keys.append("r:" + h.hexdigest())
+        return keys
+
+    def shared_key(self, aligned, fingerprint):
+        return "s:" + hashlib.sha256(fingerprint.encode() + aligned.present.tobytes()).hexdigest()
+
+    # ---------------------------------------------------
+    # Lookup / store
+    # ---------------------------------------------------
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+            value = self._disk_get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value, fingerprint=None):
+        self.put_many([(key, value)], fingerprint)
+
+    def put_many(self, items, fingerprint=None):
+        """Store ``items`` computed under ``fingerprint`` (default: the last one seen)."""
+        with self._lock:
+            for key, value in items:
+                self._remember(key, value)
+            self._disk_put(items, fingerprint or self._fingerprint or "")
+            sweep = time.monotonic() >= self._next_sweep
+            if sweep:
+                self._next_sweep = time.monotonic() + CACHE_SWEEP_SECONDS
+        if sweep:
+            self.expire()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._disk()
+            if conn is not None:
+                conn.execute("DELETE FROM prediction_cache")
+                conn.commit()
+
+    def expire(self, now=None):
+        """Drop disk entries nobody used within the TTL; returns how many."""
+        now = time.time() if now is None else now
+        with self._lock:
+            conn = self._disk()
+            if conn is None:
+                return 0
+            try:
+                deleted = conn.execute("DELETE FROM prediction_cache WHERE used_at < ?", (now - self.ttl,)).rowcount
+                conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Prediction cache expiry failed: {e}")
+                return 0
+        if deleted:
+            logging.info(f"Prediction cache: {deleted} expired entries removed")
+        return deleted
+
+    def stats(self):
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            "entries": len(self._memory),
+        }
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+
+    # ---------------------------------------------------
+    # SQLite tier
+    # ---------------------------------------------------
+    def _disk(self):
+        if self.path is None:
+            return None
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS prediction_cache "
+                    "(key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, value TEXT NOT NULL, used_at REAL NOT NULL DEFAULT 0)"
+                )
+                # Files written before entries expired: their rows expire on the first sweep
+                columns = [row[1] for row in self._conn.execute("PRAGMA table_info(prediction_cache)")]
+                if "used_at" not in columns:
+                    self._conn.execute("ALTER TABLE prediction_cache ADD COLUMN used_at REAL NOT NULL DEFAULT 0")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS ix_prediction_cache_used_at ON prediction_cache (used_at)")
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Prediction cache disk tier disabled: {e}")
+                self.path = None
+                return None
+        return self._conn
+
+    def _disk_get(self, key):
+        conn = self._disk()
+        if conn is None:
+            return None
+        row = conn.execute("SELECT value FROM prediction_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            conn.execute("UPDATE prediction_cache SET used_at = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        except sqlite3.Error:
+            pass  # a busy writer only delays the entry's expiry
+        return json.loads(row[0])
+
+    def _disk_put(self, items, fingerprint):
+        conn = self._disk()
+        if conn is None:
+            return
+        now = time.time()
+        try:
+            conn.executemany("INSERT OR REPLACE INTO prediction_cache (key, fingerprint, value, used_at) "
+                             "VALUES (?, ?, ?, ?)",
+                             [(key, fingerprint, json.dumps(value), now) for key, value in items])
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Prediction cache write failed: {e}")
+
+
+cache = PredictionCache() if CACHE_ENABLED else None
+
+
+def _collect_cache_metrics():
+    stats = cache.stats()
+    return [
+        ("generisk_prediction_cache_hits_total", "counter", "Prediction cache hits in memory.", stats["hits"]),
+        ("generisk_prediction_cache_disk_hits_total", "counter", "Prediction cache hits on disk.", stats["disk_hits"]),
+        ("generisk_prediction_cache_misses_total", "counter", "Prediction cache misses.", stats["misses"]),
+        ("generisk_prediction_cache_entries", "gauge", "Entries in the in-memory prediction cache.", stats["entries"]),
+    ]
+
+
+if cache is not None:
+    metrics.registry.register_collector(_collect_cache_metrics)
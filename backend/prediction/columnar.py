@@ -0,0 +1,157 @@
+import io
+import os
+import zipfile
+import numpy as np
+
+# Binary columnar uploads: Parquet, Feather / Arrow IPC and NumPy .npz.
+# Parquet and Feather need pyarrow (optional); only the model genes' columns
+# are read, and each is copied once, straight into the float32 matrix.
+COLUMNAR_EXTENSIONS = (".parquet", ".feather", ".arrow", ".npz")
+
+# Column naming the samples in a samples x genes table
+SAMPLE_COLUMNS = ("sample", "sample_id", "id", "id_ref")
+
+
+def is_columnar(filename):
+    return str(filename).lower().endswith(COLUMNAR_EXTENSIONS)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.feather
+        import pyarrow.ipc
+    except ImportError:
+        raise ValueError("Parquet/Feather uploads need pyarrow installed on the server")
+    return pyarrow
+
+
+def _source(file):
+    """Memory-map uploads that live on disk (spooled jobs); otherwise read the stream."""
+    pa = _pyarrow()
+    stream = getattr(file, "stream", file)
+    path = getattr(stream, "name", None)
+    if isinstance(path, str) and os.path.isfile(path):
+        return pa.memory_map(path)
+    if not (hasattr(stream, "seekable") and stream.seekable()):
+        stream = io.BytesIO(stream.read())
+    stream.seek(0)
+    return pa.PythonFile(stream, mode="r")
+
+
+# ============================================================
+# Arrow table -> matrix
+# ============================================================
+def table_to_matrix(table):
+    """
+    (gene names, float32 samples x genes, sample names or None) of an Arrow
+    table with one column per gene and an optional sample column.
+    """
+    names = table.column_names
+    sample_col = next((c for c in names if c.lower() in SAMPLE_COLUMNS), None)
+
+    samples = None
+    if sample_col is not None:
+        samples = [str(s) for s in table.column(sample_col).to_pylist()]
+        table = table.drop([sample_col])
+
+    # Single-chunk numeric columns without nulls are viewed, not converted;
+    # the assignment is the one copy (and cast) per column
+    values = np.empty((table.num_rows, table.num_columns), dtype=np.float32)
+    for i, column in enumerate(table.columns):
+        values[:, i] = column.to_numpy(zero_copy_only=False)
+    return table.column_names, values, samples
+
+
+def _projection(names, vocab):
+    """Columns worth reading: known genes plus a sample / long-format column."""
+    keep = vocab.positions(names) >= 0
+    return [n for n, k in zip(names, keep) if k or n.lower() in SAMPLE_COLUMNS]
+
+
+# ============================================================
+# Readers
+# ============================================================
+def _read_parquet(file, vocab):
+    pa = _pyarrow()
+    parquet = pa.parquet.ParquetFile(_source(file))
+    names = parquet.schema_arrow.names
+    return parquet.read(columns=_projection(names, vocab)), names
+
+
+def _read_feather(file, vocab):
+    pa = _pyarrow()
+    source = _source(file)
+    try:
+        names = pa.ipc.open_file(source).schema.names
+    except pa.ArrowInvalid:
+        # Arrow IPC stream format: no footer, so no projection before reading
+        source.seek(0)
+        table = pa.ipc.open_stream(source).read_all()
+        return table.select(_projection(table.column_names, vocab)), table.column_names
+
+    source.seek(0)
+    return pa.feather.read_table(source, columns=_projection(names, vocab)), names
+
+
+def _read_npz(file):
+    stream = getattr(file, "stream", file)
+    stream.seek(0)
+    try:
+        data = np.load(stream, allow_pickle=False)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Invalid .npz upload: {e}")
+
+    with data:
+        if "genes" not in data or "values" not in data:
+            raise ValueError("An .npz upload must contain 'genes' and 'values' arrays")
+        values = np.asarray(data["values"], dtype=np.float32)
+        if values.ndim == 1:
+            values = values[None, :]
+        samples = data["samples"].astype(str).tolist() if "samples" in data else None
+        return data["genes"].astype(str).tolist(), values, samples
+
+
+def read_columnar(file, vocab, long_columns=None):
+    """
+    (genes, float32 samples x genes, sample names or None) of a columnar
+    upload, restricted to the vocabulary's genes where the format allows.
+
+    ``long_columns`` (gene column names, value column names) enables
+    gene/value tables: one row per gene for a single sample.
+    """
+    filename = getattr(file, "filename", "").lower()
+
+    if filename.endswith(".npz"):
+        return _read_npz(file)
+
+    if filename.endswith(".parquet"):
+        table, names = _read_parquet(file, vocab)
+    else:
+        table, names = _read_feather(file, vocab)
+
+    # gene / value layout: the projection above found no gene columns
+    if long_columns and not (vocab.positions(names) >= 0).any():
+        lowered = {n.lower(): n for n in names}
+        gene = next((lowered[c] for c in long_columns[0] if c in lowered), None)
+        value = next((lowered[c] for c in long_columns[1] if c in lowered), None)
+        if gene and value:
+            return _read_long(file, gene, value, vocab)
+
+    if table.num_columns == 0:
+        raise ValueError(f"No matching genes found. Available: {len(names)}, Required: {len(vocab)}")
+    return table_to_matrix(table)
+
+
+def _read_long(file, gene, value, vocab):
+    pa = _pyarrow()
+    if getattr(file, "filename", "").lower().endswith(".parquet"):
+        table = pa.parquet.ParquetFile(_source(file)).read(columns=[gene, value])
+    else:
+        table = pa.feather.read_table(_source(file), columns=[gene, value])
+
+    genes = np.asarray(table.column(gene).to_pylist(), dtype=object)
+    values = table.column(value).to_numpy(zero_copy_only=False).astype(np.float32)
+    keep = (vocab.positions(genes) >= 0) & ~np.isnan(values)
+    return genes[keep].tolist(), values[keep][None, :], None
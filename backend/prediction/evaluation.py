@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from backend.prediction.alignment import GeneVocabulary, ModelPlan
+from backend.prediction.registry import registry, MODEL_DIR
+from backend.prediction.bundle import source_fingerprint
+from backend.prediction import executor
+
+# Cross-cancer evaluation: every model scored on every labeled dataset.
+# Labeled datasets are samples x genes CSVs with a "status" column, one per
+# disease ({disease}_labeled.csv). Each is parsed once into a float32 .npz
+# cache; the accuracy / AUC matrix is kept on disk and only the pairs whose
+# model or dataset changed are evaluated again.
+LABELED_DIR = Path(os.environ.get("GENERISK_LABELED_DIR", MODEL_DIR.parent.parent / "data" / "labeled"))
+EVAL_CACHE_DIR = Path(os.environ.get(
+    "GENERISK_EVAL_CACHE", MODEL_DIR.parent.parent / "instance" / "evaluation"))
+
+LABEL_COLUMN = "status"
+METRICS = ("accuracy", "precision", "recall", "f1", "auc")
+
+_lock = threading.Lock()
+
+
+def dataset_path(name):
+    return LABELED_DIR / f"{name}_labeled.csv"
+
+
+def available_datasets():
+    """Diseases with a labeled dataset on disk, in registry order."""
+    return [name for name in registry.names() if dataset_path(name).exists()]
+
+
+# -------------------------------------------------------
+# Columnar dataset cache
+# -------------------------------------------------------
+class LabeledDataset:
+    """A labeled dataset aligned once onto its own gene vocabulary."""
+
+    def __init__(self, name, genes, values, labels, fingerprint):
+        self.name = name
+        self.vocab = GeneVocabulary(genes)
+        self.aligned = self.vocab.align_matrix(genes, values)
+        self.labels = labels
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def load_dataset(name):
+    """
+    Dataset ``name`` from its .npz cache, re-reading the CSV only when the
+    CSV changed since the cache was written.
+    """
+    path = dataset_path(name)
+    fingerprint = source_fingerprint([path])
+    cached = EVAL_CACHE_DIR / f"{name}.npz"
+
+    if cached.exists():
+        with np.load(cached, allow_pickle=False) as data:
+            if str(data["fingerprint"]) == fingerprint:
+                return LabeledDataset(name, data["genes"].tolist(), data["values"], data["labels"], fingerprint)
+
+    df = pd.read_csv(path)
+    if LABEL_COLUMN not in df.columns:
+        raise ValueError(f"{path.name} has no '{LABEL_COLUMN}' column")
+    labels = df[LABEL_COLUMN].to_numpy()
+    if labels.dtype == object:
+        labels = labels.astype(str)
+    features = df.drop(columns=[LABEL_COLUMN]).select_dtypes(include="number")
+    genes = np.asarray(features.columns, dtype=str)
+    values = features.to_numpy(dtype=np.float32)
+    logging.info(f"Parsed {path.name}: {values.shape[0]} samples x {values.shape[1]} genes")
+
+    EVAL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = cached.with_suffix(".tmp.npz")
+    np.savez(tmp, genes=genes, values=values, labels=labels, fingerprint=np.asarray(fingerprint))
+    os.replace(tmp, cached)
+    return LabeledDataset(name, genes.tolist(), values, labels, fingerprint)
+
+
+# -------------------------------------------------------
+# Scoring
+# -------------------------------------------------------
+def score(model, plan, dataset):
+    """Metrics of one model on one dataset (missing genes count as 0)."""
+    from sklearn.metrics import roc_auc_score
+
+    X = plan.take(dataset.aligned)
+    proba = executor.predict_proba(model, X)
+    classes = np.asarray(model.classes_)
+    predicted = classes[proba.argmax(axis=1)]
+
+    labels = dataset.labels.astype(classes.dtype) if classes.dtype.kind != "O" else dataset.labels
+    truth = labels == classes[-1]
+    positive = predicted == classes[-1]
+
+    tp = int((truth & positive).sum())
+    precision = tp / positive.sum() if positive.any() else 0.0
+    recall = tp / truth.sum() if truth.any() else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    auc = float(roc_auc_score(truth, proba[:, -1])) if 0 < truth.sum() < len(truth) else None
+
+    return {
+        "accuracy": float((predicted == labels).mean()),
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1": float(f1),
+        "auc": auc,
+        "samples": len(dataset),
+        "genes_matched": int(plan.known.sum()),
+        "genes_total": len(plan),
+    }
+
+
+# -------------------------------------------------------
+# Incremental cross matrix
+# -------------------------------------------------------
+def _results_path():
+    return EVAL_CACHE_DIR / "cross_matrix.json"
+
+
+def _load_results():
+    try:
+        return json.loads(_results_path().read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _fingerprints():
+    """({model: fingerprint}, {dataset: fingerprint}); file stats only, nothing is loaded."""
+    models = {name: source_fingerprint(registry.source_files([name])) for name in registry.names()}
+    data_fps = {name: source_fingerprint([dataset_path(name)]) for name in available_datasets()}
+    return models, data_fps
+
+
+def _fresh(results, model, dataset, models, data_fps):
+    return results.get(model, {}).get(dataset, {}).get("fingerprint") == [models[model], data_fps[dataset]]
+
+
+def cached_matrix():
+    """
+    (matrix, datasets, pending) from the stored results, without evaluating
+    anything: only up-to-date pairs are in ``matrix``; ``pending`` counts the
+    pairs that are missing or stale.
+    """
+    with registry.use():
+        models, data_fps = _fingerprints()
+    results = _load_results()
+
+    matrix = {m: {d: results[m][d] for d in data_fps if _fresh(results, m, d, models, data_fps)} for m in models}
+    pending = len(models) * len(data_fps) - sum(len(row) for row in matrix.values())
+    return matrix, list(data_fps), pending
+
+
+# -------------------------------------------------------
+# Background refresh (the web pages never evaluate in the request)
+# -------------------------------------------------------
+_refresh = None
+_refresh_error = None
+_refresh_lock = threading.Lock()
+
+
+def refresh_in_background(force=False):
+    """Run cross_matrix() in a background thread unless one is running; True if started."""
+    global _refresh
+    with _refresh_lock:
+        if _refresh is not None and _refresh.is_alive():
+            return False
+        _refresh = threading.Thread(target=_run_refresh, args=(force,), name="cross-evaluation", daemon=True)
+        _refresh.start()
+        return True
+
+
+def _run_refresh(force):
+    global _refresh_error
+    try:
+        cross_matrix(force)
+        _refresh_error = None
+    except Exception as e:
+        _refresh_error = str(e)
+        logging.exception("Cross-cancer evaluation failed")
+
+
+def refresh_error():
+    """Message of the last failed background refresh, None if it succeeded."""
+    return _refresh_error
+
+
+def cross_matrix(force=False):
+    """
+    {model: {dataset: metrics}} for every registry model and labeled dataset.
+    Only pairs whose model or dataset fingerprint changed are evaluated;
+    they run concurrently on the shared inference pool.
+    """
+    with _lock, registry.use():
+        results = {} if force else _load_results()
+        models, data_fps = _fingerprints()
+        datasets = list(data_fps)
+
+        stale = [(m, d) for m in models for d in datasets if not _fresh(results, m, d, models, data_fps)]
+
+        if stale:
+            loaded = {d: load_dataset(d) for d in sorted({d for _, d in stale})}
+            plans = {}
+            for m, d in stale:
+                entry = registry.get(m)
+                plans[m, d] = (entry.model, ModelPlan(m, entry.plan.feature_names, loaded[d].vocab))
+
+            def evaluate(pair):
+                model, plan = plans[pair]
+                return score(model, plan, loaded[pair[1]])
+
+            for (m, d), metrics in zip(stale, executor.parallel_map(evaluate, stale)):
+                metrics["fingerprint"] = [models[m], data_fps[d]]
+                results.setdefault(m, {})[d] = metrics
+            logging.info(f"Cross-cancer evaluation: {len(stale)} pair(s) recomputed")
+
+            EVAL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = _results_path().with_suffix(".tmp")
+            tmp.write_text(json.dumps(results, indent=2))
+            os.replace(tmp, _results_path())
+
+        return {m: {d: results[m][d] for d in datasets} for m in models}
+
+
+if __name__ == "__main__":
+    # python -m backend.prediction.evaluation [--force]
+    logging.basicConfig(level=logging.INFO)
+    matrix = cross_matrix(force="--force" in sys.argv[1:])
+    if not available_datasets():
+        print(f"No labeled datasets in {LABELED_DIR}")
+    for model, row in matrix.items():
+        cells = "  ".join(f"{d}: acc {r['accuracy']:.3f} auc {r['auc'] if r['auc'] is None else round(r['auc'], 3)}"
+                          for d, r in row.items())
+        print(f"{model:>8} -> {cells}")
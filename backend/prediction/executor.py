@@ -0,0 +1,94 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from joblib import parallel_config
+from backend.prediction.forest import CompiledForest
+
+# Shared inference pool. The three disease models, and tree chunks inside a
+# compiled forest, run on it concurrently; the NumPy/sklearn kernels release
+# the GIL. 1 (or 0) evaluates everything serially in the calling thread.
+INFERENCE_THREADS = int(os.environ.get("GENERISK_INFERENCE_THREADS", os.cpu_count() or 1))
+
+# A compiled forest is split into one chunk per thread, each of at least
+# this many trees (the shipped forests have 40: 4 threads -> 4 chunks of 10)
+MIN_TREES_PER_CHUNK = int(os.environ.get("GENERISK_MIN_TREES_PER_CHUNK", 8))
+
+_pool = None
+_threads = INFERENCE_THREADS
+_lock = threading.Lock()
+
+
+# -------------------------------------------------------
+# Pool
+# -------------------------------------------------------
+def configure(threads):
+    """Resize the shared pool (e.g. per deployment or for benchmarks)."""
+    global _pool, _threads
+    with _lock:
+        old, _pool, _threads = _pool, None, max(int(threads), 1)
+    if old is not None:
+        old.shutdown(wait=True)
+
+
+def threads():
+    return _threads
+
+
+def get_pool():
+    global _pool
+    if _threads <= 1:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=_threads, thread_name_prefix="inference")
+            logging.info(f"Inference pool started with {_threads} threads")
+        return _pool
+
+
+def parallel_map(fn, items):
+    """
+    ``list(map(fn, items))`` on the shared pool. The caller runs the first
+    item itself and takes back any item no worker has started yet, so tasks
+    may call parallel_map again (models -> tree chunks) without deadlocking.
+    """
+    items = list(items)
+    pool = get_pool()
+    if pool is None or len(items) < 2:
+        return [fn(item) for item in items]
+
+    futures = [pool.submit(fn, item) for item in items[1:]]
+    results = [fn(items[0])]
+    for item, future in zip(items[1:], futures):
+        results.append(fn(item) if future.cancel() else future.result())
+    return results
+
+
+# -------------------------------------------------------
+# Model evaluation
+# -------------------------------------------------------
+def tree_chunks(n_estimators, threads=None):
+    """Number of tree chunks a forest of ``n_estimators`` trees is split into."""
+    threads = _threads if threads is None else threads
+    per_chunk = max(MIN_TREES_PER_CHUNK, -(-n_estimators // max(threads, 1)), 1)
+    return -(-n_estimators // per_chunk)
+
+
+def predict_proba(model, X):
+    """
+    Class probabilities of ``model`` for ``X``. Compiled forests evaluate
+    tree chunks concurrently and still sum the trees in order, so results
+    are identical to the serial path.
+    """
+    if _threads > 1:
+        if isinstance(model, CompiledForest):
+            chunks = tree_chunks(model.n_estimators)
+            if chunks > 1:
+                return model.predict_proba(X, map=parallel_map, chunks=chunks)
+        elif getattr(model, "n_jobs", None) not in (None, 1):
+            # The pool already runs the models concurrently; a forest pickled
+            # with n_jobs=-1 would start a full set of threads per model. The
+            # joblib backend is per thread, so the shared model is left as is.
+            with parallel_config(backend="sequential"):
+                return model.predict_proba(X)
+    return model.predict_proba(X)
@@ -0,0 +1,219 @@
+import numpy as np
+
+
+# ============================================================
+# Used features
+# ============================================================
+def used_features(forest):
+    """
+    Sorted indices of the features a fitted forest actually splits on.
+    Works for sklearn forests and CompiledForest alike.
+    """
+    if isinstance(forest, CompiledForest):
+        return forest.used_features()
+
+    used = [est.tree_.feature[est.tree_.children_left != -1] for est in forest.estimators_]
+    return np.unique(np.concatenate(used)) if used else np.empty(0, dtype=np.intp)
+
+
+# ============================================================
+# Flat-array RandomForest
+# ============================================================
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier packed into flat node arrays.
+
+    All trees live in one set of arrays (feature, threshold, left, right,
+    missing_left, leaf value). Leaves point to themselves, so evaluating
+    every (sample, tree) pair is ``max_depth`` vectorized steps with no
+    per-tree Python dispatch. Probabilities match sklearn's predict_proba
+    exactly: same float32 inputs, same float64 thresholds, same per-leaf
+    normalisation and the same tree-order accumulation.
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, value,
+                 roots, max_depth, classes, feature_names_in=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_features_in_ = int(feature.max()) + 1 if feature.size else 0
+        if feature_names_in is not None:
+            self.feature_names_in_ = np.asarray(feature_names_in, dtype=object)
+            self.n_features_in_ = len(self.feature_names_in_)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    # --------------------------------------------------------
+    # Conversion
+    # --------------------------------------------------------
+    @classmethod
+    def from_sklearn(cls, forest):
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        for est in forest.estimators_:
+            t = est.tree_
+            n = t.node_count
+            is_leaf = t.children_left == -1
+            idx = np.arange(offset, offset + n, dtype=np.intp)
+
+            features.append(np.where(is_leaf, 0, t.feature).astype(np.intp))
+            thresholds.append(np.asarray(t.threshold, dtype=np.float64))
+            lefts.append(np.where(is_leaf, idx, t.children_left + offset).astype(np.intp))
+            rights.append(np.where(is_leaf, idx, t.children_right + offset).astype(np.intp))
+
+            mgl = getattr(t, "missing_go_to_left", None)
+            missing.append(np.zeros(n, dtype=bool) if mgl is None else np.asarray(mgl, dtype=bool))
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            v = np.asarray(t.value[:, 0, :], dtype=np.float64)
+            norm = v.sum(axis=1, keepdims=True)
+            norm[norm == 0.0] = 1.0
+            values.append(v / norm)
+
+            roots.append(offset)
+            max_depth = max(max_depth, t.max_depth)
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            missing_left=np.concatenate(missing),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=np.asarray(forest.classes_),
+            feature_names_in=getattr(forest, "feature_names_in_", None),
+        )
+
+    # --------------------------------------------------------
+    # Inference
+    # --------------------------------------------------------
+    def apply(self, X, trees=None):
+        """
+        Leaf index of every (sample, tree) pair, shape (n_samples, n_trees).
+        ``trees`` optionally selects a subset (indices into the forest).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        roots = self.roots if trees is None else self.roots[trees]
+
+        node = np.repeat(roots[None, :], X.shape[0], axis=0)
+        rows = np.arange(X.shape[0])[:, None]
+
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = (x <= self.threshold[node]) | (np.isnan(x) & self.missing_left[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        return node
+
+    def predict_proba(self, X, map=map, chunks=1):
+        """
+        ``map`` and ``chunks`` let a caller find the leaves of tree chunks
+        concurrently (see backend.prediction.executor); the accumulation
+        below stays in tree order either way.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[-1]} features, but the forest expects {self.n_features_in_}")
+
+        if chunks > 1:
+            parts = np.array_split(np.arange(self.n_estimators), chunks)
+            leaves = np.hstack(list(map(lambda trees: self.apply(X, trees), parts)))
+        else:
+            leaves = self.apply(X)
+
+        # Accumulate tree by tree, in order, exactly like sklearn does
+        proba = np.zeros((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        for t in range(leaves.shape[1]):
+            proba += self.value[leaves[:, t]]
+
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    # --------------------------------------------------------
+    # Feature pruning
+    # --------------------------------------------------------
+    def used_features(self):
+        internal = self.left != np.arange(self.n_nodes)
+        return np.unique(self.feature[internal])
+
+    def prune(self):
+        """
+        Compact copy that only takes the features the trees split on, with
+        node features remapped to positions in that reduced input.
+        """
+        used = self.used_features()
+        remap = np.zeros(self.n_features_in_, dtype=np.intp)
+        remap[used] = np.arange(len(used))
+
+        names = None
+        if hasattr(self, "feature_names_in_"):
+            names = self.feature_names_in_[used]
+
+        pruned = CompiledForest(
+            feature=remap[self.feature],
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            missing_left=self.missing_left,
+            value=self.value,
+            roots=self.roots,
+            max_depth=self.max_depth,
+            classes=self.classes_,
+            feature_names_in=names,
+        )
+        pruned.n_features_in_ = len(used)
+        return pruned
+
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+    ARRAYS = ("feature", "threshold", "left", "right", "missing_left", "value", "roots", "classes_")
+
+    def save(self, path):
+        arrays = {k: getattr(self, k) for k in self.ARRAYS}
+        arrays["max_depth"] = np.asarray(self.max_depth)
+        arrays["n_features_in_"] = np.asarray(self.n_features_in_)
+        if hasattr(self, "feature_names_in_"):
+            arrays["feature_names_in_"] = self.feature_names_in_.astype(str)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            forest = cls(
+                feature=data["feature"],
+                threshold=data["threshold"],
+                left=data["left"],
+                right=data["right"],
+                missing_left=data["missing_left"],
+                value=data["value"],
+                roots=data["roots"],
+                max_depth=int(data["max_depth"]),
+                classes=data["classes_"],
+                feature_names_in=data["feature_names_in_"] if "feature_names_in_" in data else None,
+            )
+            forest.n_features_in_ = int(data["n_features_in_"])
+        return forest
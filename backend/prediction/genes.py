@@ -0,0 +1,37 @@
+import json
+from functools import lru_cache
+from pathlib import Path
+from werkzeug.utils import secure_filename
+
+# Base directories
+BASE_DIR = Path(__file__).parent.parent
+MODELS_DIR = BASE_DIR / "models"
+
+
+# ------------------------------
+# Load ordered gene lists
+# ------------------------------
+def load_genes_file(fname, directory=MODELS_DIR):
+    # Secure filename to prevent path traversal
+    secure_fname = secure_filename(fname)
+    path = Path(directory) / secure_fname
+    
+    try:
+        with open(path, "r") as f:
+            genes = json.load(f)
+        return [g.strip() for g in genes if isinstance(g, str) and g.strip()]
+    except (FileNotFoundError, PermissionError, json.JSONDecodeError) as e:
+        raise ValueError(f"Failed to load gene file {fname}: {str(e)}")
+
+
+# ------------------------------
+# Unified vocabulary (built on first use, not at import)
+# ------------------------------
+@lru_cache(maxsize=1)
+def get_model_genes():
+    model_concat = (
+        load_genes_file("breast_genes.json")
+        + load_genes_file("lung_genes.json")
+        + load_genes_file("ovarian_genes.json")
+    )
+    return list(dict.fromkeys([g.upper() for g in model_concat]))
@@ -0,0 +1,45 @@
+import json
+import zlib
+import hashlib
+import numpy as np
+
+
+# ============================================================
+# Compressed gene-overlap bitsets
+# ============================================================
+# A prediction's matched genes are stored as one bit per model feature,
+# diseases concatenated in a fixed order, packed with np.packbits and
+# zlib-compressed. The feature lists the bits refer to are identified by a
+# version hash and stored once (OverlapVocabulary), not on every row.
+
+def vocabulary_version(features):
+    """Stable short hash of {disease: [feature names]}."""
+    payload = json.dumps({d: [str(g) for g in genes] for d, genes in features.items()})
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def encode(shared, features):
+    """
+    Pack ``shared`` ({disease: [matched gene names]}) into compressed bits
+    over ``features`` ({disease: [feature names]}, the model feature order).
+    """
+    masks = []
+    for disease, genes in features.items():
+        names = np.asarray(genes, dtype=object)
+        masks.append(np.isin(names, list(shared.get(disease, ()))))
+    bits = np.packbits(np.concatenate(masks)) if masks else np.empty(0, dtype=np.uint8)
+    return zlib.compress(bits.tobytes(), 6)
+
+
+def decode(blob, features):
+    """Inverse of ``encode``: {disease: [matched gene names]} in feature order."""
+    sizes = [len(genes) for genes in features.values()]
+    bits = np.unpackbits(np.frombuffer(zlib.decompress(blob), dtype=np.uint8), count=sum(sizes)).astype(bool)
+
+    shared = {}
+    start = 0
+    for (disease, genes), size in zip(features.items(), sizes):
+        mask = bits[start:start + size]
+        shared[disease] = [g for g, hit in zip(genes, mask) if hit]
+        start += size
+    return shared
@@ -1,100 +1,215 @@
+import numpy as np
 import pandas as pd
 import io
-import os
-import json
+import csv
+import gzip
 import logging
-from pathlib import Path
-from werkzeug.utils import secure_filename
-
-# Base directories
-BASE_DIR = Path(__file__).parent.parent
-MODELS_DIR = BASE_DIR / "models"
-
-# ------------------------------
-# Load ordered gene lists
-# ------------------------------
-def load_genes_file(fname):
-    # Secure filename to prevent path traversal
-    secure_fname = secure_filename(fname)
-    path = MODELS_DIR / secure_fname
-    
-    try:
-        with open(path, "r") as f:
-            genes = json.load(f)
-        return [g.strip() for g in genes if isinstance(g, str) and g.strip()]
-    except (FileNotFoundError, PermissionError, json.JSONDecodeError) as e:
-        raise ValueError(f"Failed to load gene file {fname}: {str(e)}")
+from backend.prediction.registry import registry
+from backend.prediction.probes import get_probe_index, collapse_mean
+from backend.prediction.aliases import get_alias_index
+from backend.prediction.columnar import COLUMNAR_EXTENSIONS, is_columnar, read_columnar
+from backend.metrics import STAGE_SECONDS
+
+# Gene lists live in backend.prediction.genes; the vocabulary uploads are
+# aligned onto comes from the model registry (pruned to used features),
+# with the prebuilt alias index (if any) resolving non-exact names
+def get_vocab():
+    vocab = registry.vocab()
+    vocab.aliases = get_alias_index()
+    return vocab
+
 
-BREAST_GENES = load_genes_file("breast_genes.json")
-LUNG_GENES = load_genes_file("lung_genes.json")
-OVARIAN_GENES = load_genes_file("ovarian_genes.json")
+# Column names recognised in long (row-based) uploads
+possible_gene_cols = ["gene", "gene_name", "genesymbol", "symbol"]
+possible_value_cols = ["value", "expression", "tpm", "fpkm", "rpkm", "raw_count", "intensity"]
+possible_probe = ["probe_id", "probe", "id", "id_ref"]
 
-# Build unified list
-model_concat = BREAST_GENES + LUNG_GENES + OVARIAN_GENES
-MODEL_GENES = list(dict.fromkeys([g.upper() for g in model_concat]))
+TEXT_EXTENSIONS = (".csv", ".txt", ".tsv", ".gz")
+ALLOWED_EXTENSIONS = TEXT_EXTENSIONS + COLUMNAR_EXTENSIONS
+
+# Streaming ingest: delimiter is sniffed from the first bytes, rows are read
+# in chunks with the C parser and only rows/columns in the vocabulary are kept
+SNIFF_BYTES = 64 * 1024
+CHUNK_ROWS = 50_000
 
 
 # ============================================================
-# Preprocessing function
+# Streaming file reading
 # ============================================================
-def preprocess_data(file=None, manual_input=None):
-
-    # ------------- FILE INPUT -----------------
-    if file is not None:
+class _Upload:
+    """
+    Seekable binary stream of an upload (.gz transparently decompressed)
+    together with its sniffed delimiter and header row.
+    """
 
+    def __init__(self, file, comment=None):
         filename = getattr(file, "filename", "").lower()
 
-        # Allow .csv, .txt, .tsv, .gz
-        if filename.endswith(".csv"):
-            df = pd.read_csv(file)
+        # Allow .csv, .txt, .tsv, .gz (binary formats go through read_columnar)
+        if not filename.endswith(TEXT_EXTENSIONS):
+            raise ValueError("Allowed formats: " + ", ".join(ALLOWED_EXTENSIONS))
 
-        elif filename.endswith(".txt") or filename.endswith(".tsv"):
-            content = file.read().decode("utf-8", errors="ignore")
-            df = pd.read_csv(io.StringIO(content), sep=None, engine="python")
+        stream = getattr(file, "stream", file)
+        if not (hasattr(stream, "seekable") and stream.seekable()):
+            stream = io.BytesIO(stream.read())
+        if filename.endswith(".gz"):
+            stream = gzip.GzipFile(fileobj=stream, mode="rb")
 
-        elif filename.endswith(".gz"):
-            import gzip
-            with gzip.open(file, "rt") as f:
-                df = pd.read_csv(f, sep=None, engine="python")
+        self.stream = stream
+        self.comment = comment
+        head = stream.read(SNIFF_BYTES)
+        stream.seek(0)
+        # utf-8-sig: Excel's "CSV UTF-8" export starts with a byte order mark
+        self.head = head.decode("utf-8-sig", errors="ignore")
 
-        else:
-            raise ValueError("Allowed formats: .csv, .txt, .tsv, .gz")
-
-        if df.empty:
+        lines = [l for l in self.head.splitlines() if l.strip() and not (comment and l.startswith(comment))]
+        if not lines:
             raise ValueError("Uploaded file contains no data.")
 
-        df.columns = [c.strip().lower() for c in df.columns]
+        self.sep = "," if filename.endswith(".csv") else _sniff_delimiter(lines[:20])
+        # Header names exactly as pandas will parse them (used for usecols and
+        # column access); matching uses the stripped, lower-cased ``columns``
+        self.header = next(csv.reader(lines[:1], delimiter=self.sep))
+        self.columns = [c.strip().lower() for c in self.header]
+        # Data rows fully contained in the sniffed bytes (last one may be cut)
+        complete = lines[1:] if len(head) < SNIFF_BYTES else lines[1:-1]
+        self.head_rows = [r for r in csv.reader(complete, delimiter=self.sep) if r]
 
-        # Case A — One row
-        if df.shape[0] == 1:
-            return _filter_to_model_genes(df)
+    def original(self, lowered):
+        return self.header[self.columns.index(lowered)]
 
-        # Case B — Row-based
-        possible_gene_cols = ["gene", "gene_name", "genesymbol", "symbol"]
-        possible_value_cols = ["value", "expression", "tpm", "fpkm", "rpkm", "raw_count", "intensity"]
+    def read(self, usecols=None, nrows=None):
+        self.stream.seek(0)
+        return pd.read_csv(self.stream, sep=self.sep, engine="c", usecols=usecols, nrows=nrows,
+                           comment=self.comment, encoding="utf-8-sig", encoding_errors="ignore")
+
+    def chunks(self, usecols=None):
+        self.stream.seek(0)
+        return pd.read_csv(self.stream, sep=self.sep, engine="c", usecols=usecols, chunksize=CHUNK_ROWS,
+                           comment=self.comment, encoding="utf-8-sig", encoding_errors="ignore")
+
+
+def _sniff_delimiter(lines):
+    try:
+        return csv.Sniffer().sniff("\n".join(lines), delimiters="\t,;|").delimiter
+    except csv.Error:
+        header = lines[0]
+        return max("\t,;|", key=header.count) if any(d in header for d in "\t,;|") else "\t"
+
+
+def _rows_in_vocab(upload, key_col, usecols=None, known=None):
+    """
+    Stream ``upload`` and keep only rows whose ``key_col`` is a known gene
+    (or passes ``known``, a keys -> bool mask function).
+    """
+    if known is None:
+        vocab = get_vocab()
+        known = lambda keys: vocab.positions(keys) >= 0
+
+    parts = []
+    for chunk in upload.chunks(usecols=usecols):
+        keys = chunk[key_col].astype(str)
+        parts.append(chunk[known(keys)])
+
+    if not parts:
+        raise ValueError("Uploaded file contains no data.")
+    return pd.concat(parts)
+
+
+def _collapse_genes(symbols, values, samples):
+    """Samples x genes frame with duplicated gene symbols averaged."""
+    groups, genes = pd.factorize(get_vocab().positions(symbols))
+    means = collapse_mean(groups, values, len(genes))
+    return pd.DataFrame(means.T, index=samples, columns=get_vocab().genes[genes])
+
+
+def _probe_rows(upload, probe_col, usecols=None):
+    """Stream ``upload`` keeping rows whose probe ID maps to a vocabulary gene."""
+    index = get_probe_index()
+    if index is None:
+        raise ValueError("Probe IDs detected but no probe annotation index is built "
+                         "(python -m backend.prediction.probes build <GPL.annot>).")
+
+    vocab = get_vocab()
+    df = _rows_in_vocab(upload, probe_col, usecols=usecols, known=lambda keys: index.known(keys, vocab))
+    return index, vocab, df
+
+
+def _gene_columns(upload, keep=()):
+    """usecols callable keeping only header columns that are known genes."""
+    # One vectorized vocabulary lookup over the full header (upload.header
+    # only covers the sniffed bytes of very wide files)
+    header = upload.read(nrows=0).columns
+    known = {c for c, pos in zip(header, get_vocab().positions(header)) if pos >= 0}
+    keep = set(keep)
+    return lambda c: c in keep or c in known
+
+
+# ============================================================
+# Preprocessing function
+# ============================================================
+def preprocess_data(file=None, manual_input=None):
+
+    # ------------- FILE INPUT -----------------
+    if file is not None:
+
+        # Parquet / Feather / npz: projected columnar read, no text parsing
+        if is_columnar(getattr(file, "filename", "")):
+            genes, values, samples = read_columnar(
+                file, get_vocab(), long_columns=(possible_gene_cols, possible_value_cols))
+            if values.shape[0] == 0:
+                raise ValueError("Uploaded file contains no data.")
+            if values.shape[0] > 1:
+                raise ValueError("Unrecognized file format.")
+            return _align_columns(genes, values, ["sample"])
 
-        gene_col = next((c for c in df.columns if c in possible_gene_cols), None)
-        val_col = next((c for c in df.columns if c in possible_value_cols), None)
+        upload = _Upload(file)
+        columns = upload.columns
+
+        # Case B — Row-based
+        gene_col = next((c for c in columns if c in possible_gene_cols), None)
+        val_col = next((c for c in columns if c in possible_value_cols), None)
 
         if gene_col and val_col:
-            df_row = df[[gene_col, val_col]].dropna()
-            df_row = df_row.set_index(gene_col).T
+            gene, val = upload.original(gene_col), upload.original(val_col)
+            df_row = _rows_in_vocab(upload, gene, usecols=[gene, val]).dropna()
+            df_row = df_row.set_index(gene).T
             df_row.index = ["sample"]
             return _filter_to_model_genes(df_row)
 
         # Case C — Microarray
-        possible_probe = ["probe_id", "probe", "id"]
-        if any(col in df.columns for col in possible_probe) and "genesymbol" in df.columns:
+        if any(col in columns for col in possible_probe) and "genesymbol" in columns:
 
-            expr_col = next((c for c in possible_value_cols if c in df.columns), None)
+            expr_col = next((c for c in possible_value_cols if c in columns), None)
             if expr_col is None:
                 raise ValueError("Microarray detected but intensity column missing.")
 
-            df_m = df[["genesymbol", expr_col]].groupby("genesymbol").mean()
-            df_m = df_m.T
-            df_m.index = ["sample"]
+            symbol, expr = upload.original("genesymbol"), upload.original(expr_col)
+            df_m = _rows_in_vocab(upload, symbol, usecols=[symbol, expr])
+            df_m = _collapse_genes(df_m[symbol].astype(str), df_m[expr].to_numpy(dtype=np.float64), ["sample"])
             return _filter_to_model_genes(df_m)
 
+        # Case D — Raw probe IDs only (e.g. a GEO GSM table: ID_REF, VALUE)
+        probe_col = next((c for c in columns if c in possible_probe), None)
+        if probe_col and val_col:
+            probe, val = upload.original(probe_col), upload.original(val_col)
+            index, vocab, df_p = _probe_rows(upload, probe, usecols=[probe, val])
+            df_p = index.collapse(df_p[probe], df_p[val].to_numpy(dtype=np.float64), vocab=vocab, samples=["sample"])
+            return _filter_to_model_genes(df_p)
+
+        # Case A — One row (wide), parsing only the model genes' columns
+        df = upload.read(usecols=_gene_columns(upload), nrows=2)
+
+        # No known gene column selected: pandas then reports no rows either
+        if df.shape[1] == 0:
+            raise ValueError(f"No matching genes found. Available: {len(columns)}, Required: {len(get_vocab())}")
+
+        if df.shape[0] == 0:
+            raise ValueError("Uploaded file contains no data.")
+
+        if df.shape[0] == 1:
+            return _filter_to_model_genes(df)
+
         raise ValueError("Unrecognized file format.")
 
     # ------------ MANUAL INPUT -----------------
@@ -117,27 +232,84 @@ def preprocess_data(file=None, manual_input=None):
     raise ValueError("No input provided.")
 
 
+# ============================================================
+# Cohort (multi-sample) preprocessing
+# ============================================================
+def preprocess_cohort(file):
+    """
+    Align every sample of an expression matrix in one pass.
+
+    Accepts either orientation:
+    - genes x samples (GEO series matrix style, first column = gene symbols)
+    - samples x genes (first column = sample IDs, gene symbols as header)
+    - probes x samples (first column = microarray probe IDs, collapsed to
+      genes through the prebuilt probe index)
+    Lines starting with "!" (series matrix metadata) are ignored.
+    Parquet / Feather / npz cohorts are samples x genes (optional sample column).
+    """
+    if is_columnar(getattr(file, "filename", "")):
+        genes, values, samples = read_columnar(file, get_vocab())
+        if values.shape[0] == 0:
+            raise ValueError("Cohort file contains no samples.")
+        logging.info(f"Cohort detected: {values.shape[0]} samples x {values.shape[1]} genes")
+        return _align_columns(genes, values, samples)
+
+    upload = _Upload(file, comment="!")
+    first = upload.header[0]
+
+    # Orientation: whichever axis carries more known gene symbols
+    vocab = get_vocab()
+    first_col = [r[0] for r in upload.head_rows]
+    col_hits = int((vocab.positions(upload.header[1:]) >= 0).sum())
+    row_hits = int((vocab.positions(first_col) >= 0).sum())
+
+    index = get_probe_index()
+    probe_hits = int(index.known(first_col).sum()) if index is not None else 0
+
+    if probe_hits > max(row_hits, col_hits):
+        # probes x samples: stream annotated probe rows, collapse to genes
+        index, vocab, df = _probe_rows(upload, first)
+        values = df.drop(columns=first).select_dtypes(include="number")
+        df = index.collapse(df[first], values.to_numpy(dtype=np.float64), vocab=vocab,
+                            samples=[str(c) for c in values.columns])
+    elif row_hits >= col_hits:
+        # genes x samples: stream rows, keep model genes only
+        df = _rows_in_vocab(upload, first).set_index(first)
+        df = df.select_dtypes(include="number").T
+    else:
+        # samples x genes: parse only the model genes' columns
+        df = upload.read(usecols=_gene_columns(upload, keep=[first])).set_index(first)
+        df = df.select_dtypes(include="number")
+
+    if df.shape[0] == 0:
+        raise ValueError("Cohort file contains no samples.")
+
+    logging.info(f"Cohort detected: {df.shape[0]} samples x {df.shape[1]} genes")
+
+    return _filter_to_model_genes(df)
+
+
 # ============================================================
 # Gene filtering
 # ============================================================
 def _filter_to_model_genes(df):
     if df is None or df.empty:
         raise ValueError("Input DataFrame is empty or None")
-    
-    df.columns = [c.upper() for c in df.columns]
-    
-    usable = [g for g in MODEL_GENES if g in df.columns]
-    
-    if not usable:
-        raise ValueError(f"No matching genes found. Available: {len(df.columns)}, Required: {len(MODEL_GENES)}")
-    
-    # Remove duplicate columns first, then fill missing genes with 0
-    df = df.loc[:, ~df.columns.duplicated()]
-    df_final = df.reindex(columns=MODEL_GENES, fill_value=0)
-    
-    logging.info(f"Gene matching: {len(usable)}/{len(MODEL_GENES)} genes found")
-    logging.info(f"Input data shape: {df_final.shape}")
-    logging.info(f"Non-zero values in input: {(df_final != 0).sum().sum()}")
-    logging.info(f"Sample input values: {df_final.iloc[0, :5].values}")
-    
-    return df_final
+
+    return _align_columns(df.columns, df, [str(i) for i in df.index])
+
+
+def _align_columns(genes, values, samples=None):
+    vocab = get_vocab()
+    with STAGE_SECONDS.time(stage="align"):
+        aligned = vocab.align_matrix(genes, values, samples)
+
+    logging.info(f"Gene matching: {aligned.n_genes}/{len(vocab)} genes found ({aligned.n_aliased} through aliases)")
+    logging.info(f"Input data shape: {aligned.values.shape}")
+
+    # Full-matrix statistics only when someone is reading debug logs
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"Non-zero values in input: {np.count_nonzero(aligned.values)}")
+        logging.debug(f"Sample input values: {aligned.values[0, :5]}")
+
+    return aligned
@@ -0,0 +1,263 @@
+import os
+import sys
+import gzip
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from backend.prediction.genes import MODELS_DIR
+
+# Prebuilt probe -> gene index (from GEO GPL .annot files, e.g. GPL96/GPL570).
+# Built once with ``python -m backend.prediction.probes build <annot> ...``;
+# uploads never touch the annotation files themselves.
+PROBE_INDEX_PATH = Path(os.environ.get("GENERISK_PROBE_INDEX", MODELS_DIR / "probe_index.npz"))
+
+# Separator GEO uses for probes that hit several genes ("GENE1 /// GENE2")
+MULTI_GENE_SEP = "///"
+
+
+# ============================================================
+# Group mean
+# ============================================================
+def collapse_mean(groups, values, n_groups):
+    """
+    Mean of the rows of ``values`` (n_rows x n_samples) per group code, with
+    NaNs skipped like ``groupby().mean()``. One bincount over the flattened
+    (group, sample) pairs. Returns (n_groups, n_samples); groups with no
+    values are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    n_samples = values.shape[1]
+
+    valid = ~np.isnan(values)
+    slots = (np.asarray(groups, dtype=np.intp)[:, None] * n_samples + np.arange(n_samples)).ravel()
+    size = n_groups * n_samples
+
+    sums = np.bincount(slots, weights=np.where(valid, values, 0.0).ravel(), minlength=size)
+    counts = np.bincount(slots, weights=valid.ravel(), minlength=size)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums / counts).reshape(n_groups, n_samples)
+
+
+# ============================================================
+# Probe index
+# ============================================================
+class ProbeIndex:
+    """
+    CSR-style probe -> gene mapping.
+
+    probes  - sorted probe IDs
+    offsets - probe i maps to codes[offsets[i]:offsets[i + 1]]
+    codes   - integer gene codes into ``genes``
+    genes   - upper-case gene symbols
+    """
+
+    def __init__(self, probes, offsets, codes, genes, platforms=()):
+        self.probes = pd.Index(probes)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.genes = np.asarray(genes)
+        self.platforms = [str(p) for p in platforms]
+        self._vocab_map = (None, None, None)
+
+    def __len__(self):
+        return len(self.probes)
+
+    # --------------------------------------------------------
+    # Lookup
+    # --------------------------------------------------------
+    def lookup(self, probe_ids):
+        """Index position of every probe ID, -1 where it is not annotated."""
+        ids = pd.Index(np.asarray(probe_ids, dtype=object)).astype(str).str.strip()
+        return self.probes.get_indexer(ids)
+
+    def _vocab_map_for(self, vocab):
+        """
+        (vocabulary position of every gene code, mask of probes hitting at
+        least one vocabulary gene), computed once per vocabulary.
+        """
+        cached_vocab, gene_pos, useful = self._vocab_map
+        if cached_vocab is not vocab:
+            gene_pos = vocab.positions(self.genes)
+            probe_of_code = np.repeat(np.arange(len(self.probes)), np.diff(self.offsets))
+            hits = np.bincount(probe_of_code, weights=gene_pos[self.codes] >= 0, minlength=len(self.probes))
+            useful = hits > 0
+            self._vocab_map = (vocab, gene_pos, useful)
+        return gene_pos, useful
+
+    def known(self, probe_ids, vocab=None):
+        """Mask of probe IDs that map to at least one gene (of ``vocab``)."""
+        idx = self.lookup(probe_ids)
+        if vocab is None:
+            return idx >= 0
+
+        _, useful = self._vocab_map_for(vocab)
+        return np.append(useful, False)[idx]
+
+    # --------------------------------------------------------
+    # Collapse probes -> genes
+    # --------------------------------------------------------
+    def collapse(self, probe_ids, values, vocab=None, samples=None):
+        """
+        Average expression ``values`` (n_probes x n_samples) per gene.
+
+        Multi-gene probes contribute to every gene they hit; unknown probes
+        are dropped. With ``vocab`` only the vocabulary's genes are kept.
+        Returns a DataFrame of samples x genes.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+
+        idx = self.lookup(probe_ids)
+        rows = np.flatnonzero(idx >= 0)
+        idx = idx[rows]
+
+        # Expand every probe row into one (row, gene code) pair per gene
+        starts, stops = self.offsets[idx], self.offsets[idx + 1]
+        counts = stops - starts
+        pair_rows = np.repeat(rows, counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_codes = self.codes[np.repeat(starts, counts) + within]
+
+        if vocab is not None:
+            gene_pos, _ = self._vocab_map_for(vocab)
+            keep = gene_pos[pair_codes] >= 0
+            pair_rows, pair_codes = pair_rows[keep], pair_codes[keep]
+
+        if len(pair_codes) == 0:
+            raise ValueError("None of the uploaded probe IDs map to a model gene.")
+
+        # Collapse onto the genes actually hit
+        groups, genes = pd.factorize(pair_codes, sort=True)
+        means = collapse_mean(groups, values[pair_rows], len(genes))
+
+        if samples is None:
+            samples = [str(i) for i in range(values.shape[1])]
+        return pd.DataFrame(means.T, index=samples, columns=self.genes[genes])
+
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+    def save(self, path):
+        np.savez(
+            path,
+            probes=self.probes.to_numpy().astype(str),
+            offsets=self.offsets,
+            codes=self.codes,
+            genes=self.genes.astype(str),
+            platforms=np.asarray(self.platforms, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["probes"], data["offsets"], data["codes"], data["genes"], data["platforms"])
+
+
+# ============================================================
+# Building the index from GPL annotation files
+# ============================================================
+def _open_annotation(path):
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="ignore")
+    return open(path, "r", encoding="utf-8", errors="ignore")
+
+
+def read_annotation(path):
+    """
+    (probe, gene symbol) pairs of one GPL .annot / SOFT platform table.
+    Only the table's ID and gene symbol columns are parsed.
+    """
+    with _open_annotation(path) as f:
+        # Skip the metadata block up to the "ID\t..." table header
+        for line in f:
+            if line.startswith("ID\t"):
+                header = [c.strip().lower() for c in line.rstrip("\n").split("\t")]
+                break
+        else:
+            raise ValueError(f"No probe table found in {path}")
+
+        gene_col = next((c for c in ("gene symbol", "gene_symbol", "symbol") if c in header), None)
+        if gene_col is None:
+            raise ValueError(f"Gene symbol column not found in {path}")
+
+        df = pd.read_csv(f, sep="\t", header=None, usecols=[0, header.index(gene_col)],
+                         dtype=str, engine="c")
+
+    df.columns = ["probe", "gene"]
+    df = df[~df["probe"].str.startswith("!", na=True)].dropna()
+    return df
+
+
+def build_probe_index(annotation_paths):
+    """
+    Merge GPL annotations into one ProbeIndex. ``///`` multi-gene entries are
+    expanded; a probe listed by several platforms keeps the union of genes.
+    """
+    pairs = []
+    platforms = []
+    for path in annotation_paths:
+        df = read_annotation(path)
+        platforms.append(Path(path).name.split(".")[0])
+        logging.info(f"{Path(path).name}: {len(df)} annotated probes")
+        pairs.append(df)
+
+    df = pd.concat(pairs, ignore_index=True)
+    df["probe"] = df["probe"].str.strip()
+    df["gene"] = df["gene"].str.split(MULTI_GENE_SEP)
+    df = df.explode("gene")
+    df["gene"] = df["gene"].str.strip().str.upper()
+    df = df[df["gene"] != ""].drop_duplicates()
+
+    gene_codes, genes = pd.factorize(df["gene"], sort=True)
+    probe_codes, probes = pd.factorize(df["probe"], sort=True)
+
+    order = np.lexsort((gene_codes, probe_codes))
+    offsets = np.zeros(len(probes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(probe_codes, minlength=len(probes)), out=offsets[1:])
+
+    return ProbeIndex(probes, offsets, gene_codes[order], np.asarray(genes, dtype=str), platforms)
+
+
+# ============================================================
+# Loading (once per process)
+# ============================================================
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_probe_index(path=PROBE_INDEX_PATH):
+    """The prebuilt ProbeIndex, or None if it has not been built."""
+    global _index, _index_mtime
+
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _index_lock:
+        if _index is None or mtime != _index_mtime:
+            _index = ProbeIndex.load(path)
+            _index_mtime = mtime
+            logging.info(f"Probe index loaded: {len(_index)} probes, {len(_index.genes)} genes ({', '.join(_index.platforms)})")
+        return _index
+
+
+if __name__ == "__main__":
+    # python -m backend.prediction.probes build GPL96.annot GPL570.annot.gz ...
+    #   -> write backend/models/probe_index.npz (GENERISK_PROBE_INDEX overrides)
+    if len(sys.argv) < 3 or sys.argv[1] != "build":
+        print("usage: python -m backend.prediction.probes build <GPL.annot> [...]")
+        sys.exit(1)
+
+    index = build_probe_index(sys.argv[2:])
+    index.save(PROBE_INDEX_PATH)
+    print(f"✅ {PROBE_INDEX_PATH.name}: {len(index)} probes -> {len(index.genes)} genes")
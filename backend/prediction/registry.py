@@ -0,0 +1,635 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+import contextvars
+import joblib
+from contextlib import contextmanager
+from pathlib import Path
+from werkzeug.utils import secure_filename
+from backend.prediction.alignment import GeneVocabulary, ModelPlan, FEATURE_MATCHING
+from backend.prediction.forest import CompiledForest, used_features
+from backend.prediction.genes import load_genes_file
+from backend.prediction import bundle
+
+# Define base directories
+BASE_DIR = Path(__file__).parent.parent
+MODEL_DIR = BASE_DIR / "models"
+
+# "r" maps the numpy arrays of uncompressed joblib dumps read-only, so every
+# worker process shares one page-cache copy. Set to "" to load into memory.
+MMAP_MODE = os.environ.get("GENERISK_MMAP_MODE", "r") or None
+
+# "sklearn" runs the forests' own predict_proba; "compiled" converts each
+# forest into flat node arrays (backend.prediction.forest) at load time.
+INFERENCE_BACKEND = os.environ.get("GENERISK_INFERENCE_BACKEND", "sklearn")
+INFERENCE_BACKENDS = ("sklearn", "compiled")
+
+# Align and parse only the genes the forests split on ("0" keeps every gene
+# listed in the *_genes.json files)
+PRUNE_FEATURES = os.environ.get("GENERISK_PRUNE_FEATURES", "1") != "0"
+
+# Precompiled vocabulary + model arrays that every worker memory-maps
+# (backend.prediction.bundle). Used whenever it exists and was built from the
+# current model files; build it with ``python -m backend.prediction.registry bundle``.
+# Set to "" to always load the pickles.
+BUNDLE_PATH = os.environ.get("GENERISK_BUNDLE", str(MODEL_DIR / "models.bundle"))
+
+# disease -> (model file, gene list file)
+MODEL_FILES = {
+    "breast": ("breast_balanced_model.pkl", "breast_genes.json"),
+    "ovarian": ("ovarian_balanced_model.pkl", "ovarian_genes.json"),
+    "lung": ("lung_balanced_model.pkl", "lung_genes.json"),
+}
+
+
+# Versioned model sets. The manifest names every version and the current one:
+#   {"current": "2026-10",
+#    "versions": {"2026-10": {"dir": "2026-10",
+#                             "models": {"breast": {"model": "...pkl", "genes": "...json"}, ...}}}}
+# ("dir" is relative to MODEL_DIR; "models" defaults to MODEL_FILES). Without
+# a manifest the MODEL_FILES in MODEL_DIR form one implicit version named
+# after their fingerprint. Publish with ``python -m backend.prediction.registry publish``.
+MANIFEST_PATH = Path(os.environ.get("GENERISK_MODEL_MANIFEST", MODEL_DIR / "manifest.json"))
+
+# How often (seconds) requests look for a new current version; it is loaded
+# in the background and swapped in when complete. "0" disables hot reload.
+RELOAD_SECONDS = float(os.environ.get("GENERISK_MODEL_RELOAD_SECONDS", 5))
+
+
+# -------------------------------------------------------
+# Loaded model entry
+# -------------------------------------------------------
+class LoadedModel:
+    def __init__(self, name, model, plan):
+        self.name = name
+        self.model = model
+        self.plan = plan
+
+
+# -------------------------------------------------------
+# Manifest
+# -------------------------------------------------------
+class VersionSpec:
+    """Where one model version lives: its id, directory and disease -> (model, genes) files."""
+
+    def __init__(self, version, model_dir, model_files):
+        self.version = version
+        self.model_dir = Path(model_dir)
+        self.model_files = dict(model_files)
+
+
+def read_manifest(path=MANIFEST_PATH):
+    """(current version, {version: VersionSpec}), or None if there is no manifest."""
+    path = Path(path)
+    try:
+        manifest = json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid model manifest {path.name}: {e}")
+
+    root = path.parent.resolve()
+    specs = {}
+    for version, entry in manifest.get("versions", {}).items():
+        model_dir = (root / entry.get("dir", version)).resolve()
+        if root not in (model_dir, *model_dir.parents):
+            raise ValueError(f"Model version {version} points outside {root}")
+        models = entry.get("models")
+        files = {name: (m["model"], m["genes"]) for name, m in models.items()} if models else MODEL_FILES
+        specs[version] = VersionSpec(version, model_dir, files)
+
+    current = manifest.get("current")
+    if current not in specs:
+        raise ValueError(f"Model manifest names unknown current version: {current}")
+    return current, specs
+
+
+def write_manifest(current, specs, path=MANIFEST_PATH):
+    """Atomically replace the manifest; running workers pick it up on their next check."""
+    path = Path(path)
+    root = path.parent.resolve()
+    manifest = {
+        "current": current,
+        "versions": {
+            version: {
+                "dir": os.path.relpath(spec.model_dir.resolve(), root),
+                "models": {name: {"model": m, "genes": g} for name, (m, g) in spec.model_files.items()},
+            }
+            for version, spec in specs.items()
+        },
+    }
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, path)
+
+
+def implicit_spec(model_files=MODEL_FILES, model_dir=MODEL_DIR):
+    """The manifest-less version: ``model_files`` in ``model_dir``, named by their fingerprint."""
+    model_dir = Path(model_dir)
+    paths = []
+    for model_file, gene_file in model_files.values():
+        path = model_dir / secure_filename(model_file)
+        paths += [path, compact_path(path), model_dir / secure_filename(gene_file)]
+    digest = hashlib.sha256(bundle.source_fingerprint(paths).encode()).hexdigest()[:12]
+    return VersionSpec(f"files-{digest}", model_dir, model_files)
+
+
+# -------------------------------------------------------
+# One loaded version
+# -------------------------------------------------------
+class ModelVersion:
+    """
+    The models and alignment vocabulary of one version, loaded once and
+    never modified. ``refs`` counts the requests using it; a version that
+    was replaced is released when the last of them finishes.
+
+    With ``prune`` enabled the alignment vocabulary is the union of genes the
+    forests actually split on, so parsing and alignment only ever touch those.
+    """
+
+    def __init__(self, spec, mmap_mode=MMAP_MODE, backend=INFERENCE_BACKEND, prune=PRUNE_FEATURES,
+                 bundle_path=None):
+        self.version = spec.version
+        self.model_files = spec.model_files
+        self.model_dir = spec.model_dir
+        self.mmap_mode = mmap_mode
+        self.backend = backend
+        self.prune = prune
+        self.bundle_path = Path(bundle_path) if bundle_path else None
+        self.refs = 0
+        self.retired = False
+        self._loaded = {}
+        self._vocab = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<ModelVersion {self.version}>"
+
+    def names(self):
+        return list(self.model_files)
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def get(self, name):
+        if name not in self.model_files:
+            raise ValueError(f"Unknown model: {name}")
+        self._ensure_loaded()
+        return self._loaded[name]
+
+    def items(self):
+        self._ensure_loaded()
+        for name in self.model_files:
+            yield name, self._loaded[name]
+
+    def vocab(self):
+        """Gene vocabulary every upload is aligned onto."""
+        if self._vocab is None:
+            if self.prune:
+                self._ensure_loaded()
+            else:
+                with self._lock:
+                    if self._vocab is None:
+                        self._vocab = GeneVocabulary(self._listed_genes())
+        return self._vocab
+
+    def load(self):
+        self._ensure_loaded()
+        return self
+
+    def release(self):
+        """Drop the models (and their memory maps) of a version nobody uses any more."""
+        with self._lock:
+            self._loaded = {}
+            self._vocab = None
+        logging.info(f"Model version {self.version} released")
+
+    # ---------------------------------------------------
+    # Loading
+    # ---------------------------------------------------
+    def _listed_genes(self):
+        genes = [g for _, gene_file in self.model_files.values() for g in load_genes_file(gene_file, self.model_dir)]
+        return list(dict.fromkeys(g.upper() for g in genes))
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+
+        with self._lock:
+            if self._loaded:
+                return
+
+            if self._load_bundle():
+                return
+
+            models = {name: self._load_model(name) for name in self.model_files}
+
+            if self.prune:
+                used = {name: used_features(model) for name, model in models.items()}
+                genes = [g for name, model in models.items() for g in model.feature_names_in_[used[name]]]
+                vocab = GeneVocabulary(genes)
+                logging.info(f"Pruned vocabulary: {len(vocab)} genes used by the forests")
+            else:
+                used = {name: None for name in models}
+                vocab = self._vocab or GeneVocabulary(self._listed_genes())
+
+            loaded = {}
+            for name, model in models.items():
+                in_use = used[name]
+                if isinstance(model, CompiledForest):
+                    # Compiled forests are remapped to take only the used genes
+                    if self.prune:
+                        model = model.prune()
+                    in_use = None
+                loaded[name] = LoadedModel(name, model, ModelPlan(name, model.feature_names_in_, vocab, in_use))
+
+            self._vocab = vocab
+            self._loaded = loaded
+
+    def source_files(self, names=None):
+        """Model files (pickles and compact forests) behind ``names``, default all models."""
+        paths = []
+        for name in names or self.model_files:
+            path = self.model_dir / secure_filename(self.model_files[name][0])
+            paths += [path, compact_path(path)]
+        return paths
+
+    def _load_bundle(self):
+        """Serve vocabulary and compiled forests from the mapped bundle, if current."""
+        if not (self.prune and self.bundle_path and self.bundle_path.exists()):
+            return False
+
+        try:
+            header = bundle.read_header(self.bundle_path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Unreadable model bundle, loading the model files instead: {e}")
+            return False
+        if header["source"] != bundle.source_fingerprint(self.source_files()):
+            logging.warning(f"{self.bundle_path.name} was built from other model files, ignoring it")
+            return False
+        if header["meta"].get("matching") != FEATURE_MATCHING:
+            logging.warning(f"{self.bundle_path.name} was built with other feature matching, ignoring it")
+            return False
+        if list(header["meta"]["models"]) != list(self.model_files):
+            logging.warning(f"{self.bundle_path.name} holds other models than configured, ignoring it")
+            return False
+
+        vocab, models = bundle.load_bundle(self.bundle_path, header)
+        self._vocab = vocab
+        self._loaded = {name: LoadedModel(name, forest, plan) for name, (forest, plan) in models.items()}
+        return True
+
+    def _load_model(self, name):
+        model_file = self.model_files[name][0]
+        path = self.model_dir / secure_filename(model_file)
+        compact = compact_path(path)
+
+        # Pre-compiled compact forest, if it is at least as new as the pickle
+        if self.backend == "compiled" and compact.exists() and (
+                not path.exists() or compact.stat().st_mtime >= path.stat().st_mtime):
+            logging.info(f"Loaded {name} compact model from {compact.name}")
+            return CompiledForest.load(compact)
+
+        try:
+            model = joblib.load(path, mmap_mode=self.mmap_mode)
+        except (FileNotFoundError, PermissionError) as e:
+            raise ValueError(f"Failed to load model files: {str(e)}")
+        except Exception as e:
+            raise ValueError(f"Error loading model or genes: {str(e)}")
+
+        if self.backend == "compiled":
+            model = CompiledForest.from_sklearn(model)
+
+        logging.info(f"Loaded {name} model from {path.name} (mmap_mode={self.mmap_mode}, backend={self.backend})")
+        return model
+
+
+# -------------------------------------------------------
+# Versioned registry
+# -------------------------------------------------------
+class ModelRegistry:
+    """
+    Serves the current ModelVersion, loaded on first use (never at import
+    time), one shared instance per process. Thread-safe.
+
+    Every ``reload_seconds`` an access checks the manifest (or, without one,
+    the model files) for a new current version. It loads in a background
+    thread while requests keep using the old one, then replaces it in a
+    single assignment. Requests pin a version with ``use()`` so everything
+    they do (alignment, models, overlap encoding) sees the same one.
+    """
+
+    def __init__(self, model_files=MODEL_FILES, model_dir=MODEL_DIR, mmap_mode=MMAP_MODE,
+                 backend=INFERENCE_BACKEND, prune=PRUNE_FEATURES, bundle_path=BUNDLE_PATH,
+                 manifest_path=MANIFEST_PATH, reload_seconds=RELOAD_SECONDS):
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend: {backend}. Use one of {INFERENCE_BACKENDS}")
+
+        self.model_files = dict(model_files)
+        self.model_dir = Path(model_dir)
+        self.mmap_mode = mmap_mode
+        self.backend = backend
+        self.prune = prune
+        self.bundle_path = Path(bundle_path) if bundle_path else None
+        self.manifest_path = Path(manifest_path) if manifest_path else None
+        self.reload_seconds = reload_seconds
+        self._current = None
+        self._preloading = None      # version id loading in the background
+        self._preload_thread = None  # the thread loading it (the last one started)
+        self._failed = None          # version id that failed to load
+        self._next_check = 0.0
+        self._pinned = contextvars.ContextVar(f"pinned_models_{id(self)}", default=None)
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------
+    # Active version (pinned by use(), else current)
+    # ---------------------------------------------------
+    def active(self):
+        return self._pinned.get() or self.current()
+
+    def version(self):
+        return self.active().version
+
+    def names(self):
+        return self.active().names()
+
+    def is_loaded(self, name):
+        return self.active().is_loaded(name)
+
+    def get(self, name):
+        return self.active().get(name)
+
+    def items(self):
+        return self.active().items()
+
+    def vocab(self):
+        return self.active().vocab()
+
+    def source_files(self, names=None):
+        return self.active().source_files(names)
+
+    # ---------------------------------------------------
+    # Pinning and reference counts
+    # ---------------------------------------------------
+    def acquire(self):
+        """The current version with its reference count raised; hand it back to release()."""
+        while True:
+            self.current()  # first load / reload check, outside the lock
+            # Resolve and count under one lock, so a concurrent swap cannot
+            # release the version between the two
+            with self._lock:
+                version = self._current
+                if version is not None:
+                    version.refs += 1
+                    return version
+
+    def release(self, version):
+        with self._lock:
+            version.refs -= 1
+            done = version.retired and version.refs == 0
+        if done:
+            version.release()
+
+    @contextmanager
+    def use(self, version=None):
+        """
+        Pin ``version`` (default: acquire the current one for the duration of
+        the block) for every registry access in this thread / context.
+        """
+        if version is None and self._pinned.get() is not None:
+            yield self._pinned.get()
+            return
+
+        owned = version is None
+        if owned:
+            version = self.acquire()
+        token = self._pinned.set(version)
+        try:
+            yield version
+        finally:
+            self._pinned.reset(token)
+            if owned:
+                self.release(version)
+
+    # ---------------------------------------------------
+    # Current version and hot reload
+    # ---------------------------------------------------
+    def current(self):
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = self._open(self._wanted())
+                    self._next_check = time.monotonic() + self.reload_seconds
+        elif self.reload_seconds > 0 and time.monotonic() >= self._next_check:
+            self._check_for_update()
+        return self._current
+
+    def clear(self):
+        """Forget the current version; the next access loads it again."""
+        with self._lock:
+            old, self._current = self._current, None
+        if old is not None:
+            self._retire(old)
+
+    def reload(self, wait=False):
+        """Look for a new current version now; ``wait`` blocks until any preload has finished."""
+        self.current()
+        self._next_check = 0.0
+        self._check_for_update()
+        thread = self._preload_thread
+        if wait and thread is not None:
+            thread.join()
+        return self.current()
+
+    def _wanted(self):
+        if self.manifest_path is not None:
+            manifest = read_manifest(self.manifest_path)
+            if manifest is not None:
+                current, specs = manifest
+                return specs[current]
+        return implicit_spec(self.model_files, self.model_dir)
+
+    def _open(self, spec):
+        bundle_path = self.bundle_path
+        if bundle_path is not None and spec.model_dir != self.model_dir:
+            bundle_path = spec.model_dir / bundle_path.name
+        logging.info(f"Loading model version {spec.version} from {spec.model_dir}")
+        return ModelVersion(spec, self.mmap_mode, self.backend, self.prune, bundle_path)
+
+    def _check_for_update(self):
+        with self._lock:
+            if time.monotonic() < self._next_check or self._preloading is not None:
+                return None
+            self._next_check = time.monotonic() + self.reload_seconds
+
+        try:
+            spec = self._wanted()
+        except (OSError, ValueError) as e:
+            logging.warning(f"Model manifest not usable, staying on {self._current.version}: {e}")
+            return None
+        if spec.version in (self._current.version, self._failed):
+            return None
+
+        with self._lock:
+            if self._preloading is not None:
+                return None
+            self._preloading = spec.version
+            # Started before it is published, so reload(wait=True) can always join it
+            thread = threading.Thread(target=self._preload, args=(spec,), name="model-preload", daemon=True)
+            thread.start()
+            self._preload_thread = thread
+        return thread
+
+    def _preload(self, spec):
+        try:
+            version = self._open(spec).load()
+        except Exception:
+            logging.exception(f"Model version {spec.version} failed to load, staying on {self._current.version}")
+            with self._lock:
+                self._failed = spec.version
+                self._preloading = None
+            return
+
+        with self._lock:
+            old, self._current = self._current, version
+            self._preloading = None
+        logging.info(f"Model version {old.version} -> {version.version}")
+        self._retire(old)
+
+    def _retire(self, version):
+        with self._lock:
+            version.retired = True
+            done = version.refs == 0
+        if done:
+            version.release()
+
+
+registry = ModelRegistry()
+
+
+# -------------------------------------------------------
+# Compile forests into compact, feature-pruned models
+# -------------------------------------------------------
+def compact_path(model_path):
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + "_compact.npz")
+
+
+def compile_model(model_path):
+    """
+    Convert a pickled forest into a CompiledForest that only takes the genes
+    its trees split on, saved next to the pickle as ``*_compact.npz``.
+    """
+    model_path = Path(model_path)
+    forest = joblib.load(model_path)
+    compiled = CompiledForest.from_sklearn(forest)
+    pruned = compiled.prune()
+
+    target = compact_path(model_path)
+    pruned.save(target)
+    return target, compiled.n_features_in_, pruned.n_features_in_
+
+
+# -------------------------------------------------------
+# Convert pickles to mmap-compatible dumps
+# -------------------------------------------------------
+def dump_for_mmap(path):
+    """
+    Re-dump a joblib/pickle model uncompressed so ``mmap_mode`` can map its
+    numpy arrays instead of copying them into every worker.
+    """
+    path = Path(path)
+    model = joblib.load(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    joblib.dump(model, tmp, compress=0)
+    os.replace(tmp, path)
+    return path
+
+
+def build_bundle(path=None, model_dir=None):
+    """
+    Compile every model of the current version (or of the version directory
+    ``model_dir``, feature-pruned) and write the shared vocabulary + model
+    bundle workers memory-map at startup.
+    """
+    if model_dir is None:
+        source = ModelRegistry(backend="compiled", prune=True, bundle_path=None, reload_seconds=0).current()
+    else:
+        source = ModelRegistry(model_dir=model_dir, backend="compiled", prune=True, bundle_path=None,
+                               manifest_path=None, reload_seconds=0).current()
+    models = {name: entry.model for name, entry in source.items()}
+    if path is None:
+        path = BUNDLE_PATH if source.model_dir == MODEL_DIR else source.model_dir / Path(BUNDLE_PATH).name
+    target = Path(path)
+    bundle.write_bundle(target, models, bundle.source_fingerprint(source.source_files()))
+    return target, len(source.vocab())
+
+
+def publish(version, directory=None, manifest_path=MANIFEST_PATH):
+    """
+    Make ``version`` current in the manifest, registering it first when
+    ``directory`` (relative to the manifest) is given. Running workers
+    preload it and swap over on their next check.
+    """
+    manifest_path = Path(manifest_path)
+    manifest = read_manifest(manifest_path)
+    specs = manifest[1] if manifest else {}
+
+    if directory is not None:
+        model_dir = manifest_path.parent / directory
+        missing = [f for m, g in MODEL_FILES.values() for f in (m, g) if not (model_dir / f).exists()]
+        if missing:
+            raise ValueError(f"{model_dir} is missing {', '.join(missing)}")
+        specs[version] = VersionSpec(version, model_dir, MODEL_FILES)
+    elif version not in specs:
+        raise ValueError(f"Unknown model version {version}; give its directory to register it")
+
+    write_manifest(version, specs, manifest_path)
+    return specs[version]
+
+
+if __name__ == "__main__":
+    # python -m backend.prediction.registry mmap [disease ...]
+    #   -> rewrite model pickles uncompressed for mmap loading
+    # python -m backend.prediction.registry compile [disease ...]
+    #   -> write feature-pruned *_compact.npz models
+    # python -m backend.prediction.registry bundle
+    #   -> write the memory-mapped vocabulary + model bundle (all diseases)
+    # python -m backend.prediction.registry publish <version> [dir]
+    #   -> register models/<dir> as <version> in the manifest and make it current
+    #      (without dir: switch back to an already registered version)
+    command = sys.argv[1] if len(sys.argv) > 1 else "mmap"
+    selected = sys.argv[2:]
+
+    if command == "publish":
+        if len(selected) not in (1, 2):
+            print("usage: python -m backend.prediction.registry publish <version> [dir]")
+            sys.exit(1)
+        try:
+            spec = publish(*selected)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ {spec.version} is the current model version ({spec.model_dir})")
+        sys.exit(0)
+
+    if command == "bundle":
+        out, genes = build_bundle()
+        print(f"✅ {out.name}: {genes} genes, {len(MODEL_FILES)} models ({out.stat().st_size / 2**20:.1f} MB)")
+        sys.exit(0)
+
+    for disease, (model_file, _) in MODEL_FILES.items():
+        if selected and disease not in selected:
+            continue
+        target = MODEL_DIR / model_file
+
+        if command == "compile":
+            out, before, after = compile_model(target)
+            print(f"✅ {disease}: {out.name} uses {after}/{before} genes")
+        else:
+            dump_for_mmap(target)
+            print(f"✅ {disease}: {target.name} rewritten for mmap loading")
@@ -1,144 +1,140 @@
-import os
-import json
-import pickle
 import pandas as pd
-import joblib
 import logging
-from pathlib import Path
-from werkzeug.utils import secure_filename
-
-# Define base directories
-BASE_DIR = Path(__file__).parent.parent
-MODEL_DIR = BASE_DIR / "models"
-
+from backend.prediction.alignment import AlignedSample
+from backend.prediction.preprocess import get_vocab
+from backend.prediction.registry import registry   # models load lazily on first use
+from backend.prediction.cache import cache
+from backend.prediction import executor
+from backend.metrics import GENE_OVERLAP, MODEL_OUTCOMES
 
 
 # -------------------------------------------------------
-# Helper: Load model + CLEAN gene list
+# Batch prediction function
 # -------------------------------------------------------
-def load_model_and_genes(model_name, gene_file):
-    # Secure filenames to prevent path traversal
-    secure_model = secure_filename(model_name)
-    secure_gene = secure_filename(gene_file)
-    
-    model_path = MODEL_DIR / secure_model
-    gene_path = MODEL_DIR / secure_gene
-
-    try:
-        # Load model
-        model = joblib.load(model_path)
-        
-        # Load gene list
-        with open(gene_path, "r") as f:
-            genes = json.load(f)
-    except (FileNotFoundError, PermissionError) as e:
-        raise ValueError(f"Failed to load model files: {str(e)}")
-    except Exception as e:
-        raise ValueError(f"Error loading model or genes: {str(e)}")
-
-    # --------- CLEAN GENE LIST ---------
-    cleaned = []
-    for g in genes:
-        if not isinstance(g, str):
-            continue
-
-        g = g.strip().upper()
-
-        # Expand merged genes like ABC1///ABC2///ABC3
-        if "///" in g:
-            parts = [p.strip().upper() for p in g.split("///") if p.strip()]
-            cleaned.extend(parts)
-        else:
-            cleaned.append(g)
+def run_predictions_batch(sample):
+    """
+    sample must be:
+    - AlignedSample with one row per sample (preprocess_data / preprocess_cohort), or
+    - DataFrame with one row per sample and gene names as columns
 
-    # Remove duplicates (preserve order)
-    cleaned = list(dict.fromkeys(cleaned))
+    Each model's predict_proba runs once over the whole matrix. Samples seen
+    before (same aligned values, same models) are served from the cache.
+    Returns (list of per-sample results dicts, shared_genes).
+    """
+    # Input validation
+    if isinstance(sample, pd.DataFrame):
+        if sample.empty:
+            raise ValueError("Input DataFrame is empty")
+        sample = get_vocab().align(sample)
 
-    return model, cleaned
+    if not isinstance(sample, AlignedSample):
+        raise ValueError("Input must be an AlignedSample or a pandas DataFrame")
 
+    if len(sample) == 0:
+        raise ValueError("Input sample is empty")
 
-# -------------------------------------------------------
-# Load models + genes
-# -------------------------------------------------------
-breast_model, breast_genes = load_model_and_genes("breast_balanced_model.pkl", "breast_genes.json")
-ovarian_model, ovarian_genes = load_model_and_genes("ovarian_balanced_model.pkl", "ovarian_genes.json")
-lung_model, lung_genes = load_model_and_genes("lung_balanced_model.pkl", "lung_genes.json")
+    if cache is None:
+        return _predict(sample)
 
+    fingerprint = cache.fingerprint()
+    keys = cache.sample_keys(sample, fingerprint)
+    shared_key = cache.shared_key(sample, fingerprint)
 
-# -------------------------------------------------------
-# Main prediction function
-# -------------------------------------------------------
-def run_predictions(sample_df):
-    """
-    sample_df must be:
-    - DataFrame of 1 row
-    - gene names as columns
-    """
-    # Input validation
-    if not isinstance(sample_df, pd.DataFrame):
-        raise ValueError("Input must be a pandas DataFrame")
-    
-    if sample_df.empty or len(sample_df) == 0:
-        raise ValueError("Input DataFrame is empty")
-    
-    results = {}
+    results = [cache.get(k) for k in keys]
+    shared_genes = cache.get(shared_key)
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if not missing and shared_genes is not None:
+        logging.info(f"Prediction cache hit for {len(results)} sample(s)")
+        return results, shared_genes
 
-    # Normalize uploaded gene column names
-    sample_df.columns = [c.upper() for c in sample_df.columns]
+    # Only run the models on samples the cache could not answer
+    rows = missing or [0]
+    fresh, shared_genes = _predict(
+        AlignedSample(sample.values[rows], sample.present, [sample.samples[i] for i in rows], sample.aliased)
+    )
 
-    # REMOVE duplicate columns from sample
-    sample_df = sample_df.loc[:, ~sample_df.columns.duplicated(keep='first')]
+    store = [(shared_key, shared_genes)]
+    for i, r in zip(missing, fresh):
+        results[i] = r
+        if not any(isinstance(v, str) and v.startswith("Error") for v in r.values()):
+            store.append((keys[i], r))
+    cache.put_many(store, fingerprint)
 
+    return results, shared_genes
+
+
+def _predict(sample):
+    results = [{} for _ in range(len(sample))]
     shared_genes = {}   # NEW — to track overlaps
 
     # ---------------------------------------------------
     # Inner function for each cancer type
     # ---------------------------------------------------
-    def predict_for(model, disease_name):
-        # Use exact order used during training
-        expected_genes = list(model.feature_names_in_)
-
-        logging.info(f"Checking {disease_name} gene list - Expected: {len(expected_genes)} genes")
-        logging.info(f"Duplicates found: {pd.Index(expected_genes).duplicated().sum()}")
-
-        # Find usable genes
-        matched = [g for g in expected_genes if g in sample_df.columns]
-
-        shared_genes[disease_name] = matched   # SAVE OVERLAP
+    def predict_for(model, plan, disease_name):
+        """(matched genes, probabilities or an outcome message) for one model."""
+        matched = plan.matched(sample)
+        usable = int(plan.known.sum())
+        GENE_OVERLAP.observe(len(matched) / usable if usable else 0.0, disease=disease_name)
 
         if not matched:
-            results[disease_name] = "Insufficient gene overlap"
             logging.warning(f"No gene overlap found for {disease_name}")
-            return
+            return matched, "Insufficient gene overlap"
 
-        # Build input vector in model's expected order
-        X = sample_df.reindex(columns=expected_genes, fill_value=0)
-        
-        # Log input data for debugging
-        logging.info(f"{disease_name} - Input shape: {X.shape}")
-        logging.info(f"{disease_name} - Non-zero values: {(X != 0).sum().sum()}")
-        logging.info(f"{disease_name} - Sample values: {X.iloc[0, :5].values}")
+        # Gather input matrix in model's expected (training) order
+        values = plan.take(sample)
 
-        # Convert to numpy row
-        values = X.values.reshape(1, -1)
+        logging.info(f"{disease_name} - Matched genes: {len(matched)}/{len(plan)} ({plan.n_aliased(sample)} through aliases)")
+        logging.info(f"{disease_name} - Input shape: {values.shape}")
 
         # Run prediction
         try:
-            prob = float(model.predict_proba(values)[0][1] * 100)
+            return matched, executor.predict_proba(model, values)[:, 1] * 100
         except Exception as e:
-            results[disease_name] = f"Error: {str(e)}"
-            return
-
-        results[disease_name] = round(prob, 2)
+            return matched, f"Error: {str(e)}"
 
     # ---------------------------------------------------
-    # Run predictions for all 3 cancers
+    # Run predictions for all 3 cancers concurrently
     # ---------------------------------------------------
-    predict_for(breast_model, "breast")
-    predict_for(ovarian_model, "ovarian")
-    predict_for(lung_model, "lung")
+    entries = list(registry.items())
+    outcomes = executor.parallel_map(lambda item: predict_for(item[1].model, item[1].plan, item[0]), entries)
 
-    logging.info(f"Prediction results: {results}")
+    # Collect in registry order so every results dict is ordered the same way
+    for (disease_name, _), (matched, outcome) in zip(entries, outcomes):
+        shared_genes[disease_name] = matched   # SAVE OVERLAP
+
+        if isinstance(outcome, str):
+            kind = "error" if outcome.startswith("Error") else "insufficient_overlap"
+            MODEL_OUTCOMES.inc(len(results), disease=disease_name, outcome=kind)
+            for r in results:
+                r[disease_name] = outcome
+        else:
+            MODEL_OUTCOMES.inc(len(results), disease=disease_name, outcome="ok")
+            for r, prob in zip(results, outcome):
+                r[disease_name] = round(float(prob), 2)
+
+    logging.info(f"Prediction results: {len(results)} sample(s)")
 
-    # Return BOTH for template
     return results, shared_genes
+
+
+# -------------------------------------------------------
+# Main prediction function
+# -------------------------------------------------------
+def run_predictions(sample):
+    """
+    sample must be:
+    - AlignedSample of 1 row (as returned by preprocess_data), or
+    - DataFrame of 1 row with gene names as columns
+    """
+    if isinstance(sample, AlignedSample) and len(sample) > 1:
+        sample = AlignedSample(sample.values[:1], sample.present, sample.samples[:1], sample.aliased)
+    elif isinstance(sample, pd.DataFrame) and len(sample) > 1:
+        sample = sample.iloc[:1]
+
+    results, shared_genes = run_predictions_batch(sample)
+
+    logging.info(f"Prediction results: {results[0]}")
+
+    # Return BOTH for template
+    return results[0], shared_genes
@@ -0,0 +1,319 @@
+"""
+Training pipeline for the disease models (replaces train_each_model.ipynb).
+
+    python -m backend.prediction.training                 # all diseases
+    python -m backend.prediction.training lung --jobs 1 --n-jobs 4
+    python -m backend.prediction.training --force         # ignore cached stages
+
+Each disease trains in its own process. Stages are cached by content hash
+under GENERISK_TRAIN_CACHE:
+
+    matrix    - labeled CSV parsed into genes / X / y      (key: CSV bytes)
+    resample  - stratified split, SMOTE where configured  (key: matrix + settings)
+    model     - fitted RandomForest                        (key: resample + settings)
+
+so retraining only redoes the stages whose inputs changed. The models are
+then published as one new model version: a complete directory under
+models/trained/ (uncompressed pickles for mmap loading, gene lists, compact
+compiled forests and the bundle when one is in use), made current by an
+atomic manifest swap that running servers pick up on their next check.
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from backend.prediction.registry import (
+    MODEL_DIR, MODEL_FILES, BUNDLE_PATH, MANIFEST_PATH, compact_path, compile_model, build_bundle,
+    implicit_spec, read_manifest, publish as publish_manifest,
+)
+from backend.prediction.evaluation import LABEL_COLUMN, dataset_path
+
+TRAIN_CACHE_DIR = Path(os.environ.get(
+    "GENERISK_TRAIN_CACHE", MODEL_DIR.parent.parent / "instance" / "training"))
+METRICS_DIR = MODEL_DIR.parent.parent / "outputs" / "metrics"
+
+# Published versions, one directory each (relative to the manifest's MODEL_DIR)
+TRAINED_DIR = "trained"
+# Written into every trained version: {disease: model stage key}
+TRAINING_KEYS_FILE = "training.json"
+
+RANDOM_STATE = 42
+TEST_SIZE = 0.2
+TOP_GENES = 100
+
+# Per-disease settings from the training notebook
+TRAINING_CONFIG = {
+    # already balanced
+    "breast": {"n_estimators": 300, "class_weight": None, "smote": False},
+    # moderate imbalance (~5:1)
+    "ovarian": {"n_estimators": 400, "class_weight": "balanced", "smote": False},
+    # severe imbalance (~11:1)
+    "lung": {"n_estimators": 400, "class_weight": "balanced", "smote": True},
+}
+
+
+# -------------------------------------------------------
+# Content-hash cache
+# -------------------------------------------------------
+def _digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True).encode() if not isinstance(part, bytes) else part)
+        h.update(b";")
+    return h.hexdigest()[:20]
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:20]
+
+
+def _stage_path(stage, key, suffix):
+    return TRAIN_CACHE_DIR / stage / f"{key}{suffix}"
+
+
+def _save_npz(path, **arrays):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+# -------------------------------------------------------
+# Stages
+# -------------------------------------------------------
+def stage_matrix(disease, force=False):
+    """(key, genes, X, y) of the disease's labeled dataset."""
+    path = dataset_path(disease)
+    key = _digest("matrix", _file_digest(path))
+    cached = _stage_path("matrix", key, ".npz")
+
+    if cached.exists() and not force:
+        with np.load(cached, allow_pickle=False) as data:
+            return key, data["genes"].tolist(), data["X"], data["y"]
+
+    df = pd.read_csv(path)
+    if LABEL_COLUMN not in df.columns:
+        raise ValueError(f"{path.name} has no '{LABEL_COLUMN}' column")
+    X = df.drop(columns=[LABEL_COLUMN])
+    genes = [str(g) for g in X.columns]
+    y = df[LABEL_COLUMN].to_numpy()
+    if y.dtype == object:
+        y = y.astype(str)
+    X = X.to_numpy(dtype=np.float64)
+
+    _save_npz(cached, genes=np.asarray(genes, dtype=str), X=X, y=y)
+    logging.info(f"{disease}: parsed {path.name} ({X.shape[0]} samples, {X.shape[1]} genes)")
+    return key, genes, X, y
+
+
+def stage_resample(disease, matrix, config, force=False):
+    """(key, X_train, y_train, X_test, y_test): stratified split, then SMOTE if configured."""
+    matrix_key, _, X, y = matrix
+    key = _digest("resample", matrix_key, TEST_SIZE, RANDOM_STATE, config["smote"])
+    cached = _stage_path("resample", key, ".npz")
+
+    if cached.exists() and not force:
+        with np.load(cached, allow_pickle=False) as data:
+            return key, data["X_train"], data["y_train"], data["X_test"], data["y_test"]
+
+    from sklearn.model_selection import train_test_split
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y)
+
+    if config["smote"]:
+        try:
+            from imblearn.over_sampling import SMOTE
+        except ImportError:
+            raise ValueError(f"{disease} training uses SMOTE, which needs imbalanced-learn installed")
+        X_train, y_train = SMOTE(random_state=RANDOM_STATE).fit_resample(X_train, y_train)
+        logging.info(f"{disease}: SMOTE resampled training set to {len(y_train)} samples")
+
+    _save_npz(cached, X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test)
+    return key, X_train, y_train, X_test, y_test
+
+
+def stage_model(disease, genes, resampled, config, n_jobs, force=False):
+    """(key, fitted RandomForestClassifier, test metrics)."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, roc_auc_score
+
+    resample_key, X_train, y_train, X_test, y_test = resampled
+    params = {"n_estimators": config["n_estimators"], "class_weight": config["class_weight"],
+              "random_state": RANDOM_STATE}
+    key = _digest("model", resample_key, params)
+    cached = _stage_path("model", key, ".pkl")
+    metrics_path = cached.with_suffix(".json")
+
+    if cached.exists() and metrics_path.exists() and not force:
+        return key, joblib.load(cached, mmap_mode="r"), json.loads(metrics_path.read_text())
+
+    # Fit on a DataFrame so the model keeps feature_names_in_ (the server aligns on them)
+    model = RandomForestClassifier(**params, n_jobs=n_jobs)
+    model.fit(pd.DataFrame(X_train, columns=genes), y_train)
+    model.n_jobs = None
+
+    proba = model.predict_proba(pd.DataFrame(X_test, columns=genes))
+    metrics = {
+        "accuracy": float(accuracy_score(y_test, model.classes_[proba.argmax(axis=1)])),
+        "auc": float(roc_auc_score(y_test, proba[:, 1])) if len(np.unique(y_test)) > 1 else None,
+        "train_samples": int(len(y_train)),
+        "test_samples": int(len(y_test)),
+    }
+
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cached.with_suffix(".tmp")
+    joblib.dump(model, tmp, compress=0)
+    os.replace(tmp, cached)
+    metrics_path.write_text(json.dumps(metrics))
+    logging.info(f"{disease}: fitted {params['n_estimators']} trees (accuracy {metrics['accuracy']:.4f})")
+    return key, model, metrics
+
+
+# -------------------------------------------------------
+# Output
+# -------------------------------------------------------
+def write_biomarkers(disease, model, genes):
+    """Top TOP_GENES genes by forest importance, as a CSV under METRICS_DIR."""
+    METRICS_DIR.mkdir(parents=True, exist_ok=True)
+    importances = pd.DataFrame({"Gene": genes, "Importance": model.feature_importances_})
+    importances.sort_values(by="Importance", ascending=False).head(TOP_GENES).to_csv(
+        METRICS_DIR / f"{disease}_top{TOP_GENES}_genes.csv", index=False)
+
+
+def _training_record(model_dir):
+    """``{"models": {disease: stage key}, "base": version}`` of a published version, or None."""
+    try:
+        return json.loads((Path(model_dir) / TRAINING_KEYS_FILE).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def publish(results, force=False, model_dir=MODEL_DIR, manifest_path=MANIFEST_PATH, bundle_path=BUNDLE_PATH):
+    """
+    Publish trained models (``train`` results) as one new model version.
+
+    The version directory is assembled in full first: trained diseases from
+    the stage cache, every other disease copied from the current version.
+    Only then is it moved into place and made current in the manifest, so a
+    server reloading meanwhile never pairs a model with another gene list.
+    Returns the version id, or None when the current version already
+    serves these models (server caches stay valid).
+    """
+    model_dir, manifest_path = Path(model_dir), Path(manifest_path)
+    manifest = read_manifest(manifest_path)
+    current = manifest[1][manifest[0]] if manifest else implicit_spec(MODEL_FILES, model_dir)
+
+    trained = {r["disease"]: r for r in results}
+    record = _training_record(current.model_dir)
+    served = record["models"] if record else {}
+    if not force and all(served.get(d) == r["model"] for d, r in trained.items()):
+        return None
+
+    # Diseases never trained here keep the files of the version they came
+    # from, so that version is part of the id alongside the stage keys
+    keys = {d: (trained[d]["model"] if d in trained else served.get(d)) for d in MODEL_FILES}
+    base = (record["base"] if record else current.version) if None in keys.values() else None
+    version = "trained-" + _digest(keys, base)[:12]
+
+    target = model_dir / TRAINED_DIR / version
+    if not target.exists():
+        staging = target.with_name(f".{version}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        for disease, (model_file, gene_file) in MODEL_FILES.items():
+            if disease in trained:
+                shutil.copyfile(_stage_path("model", trained[disease]["model"], ".pkl"), staging / model_file)
+                (staging / gene_file).write_text(json.dumps(trained[disease]["genes"]))
+                compile_model(staging / model_file)
+            else:
+                for name in (model_file, gene_file, compact_path(model_file).name):
+                    if (current.model_dir / name).exists():
+                        shutil.copy2(current.model_dir / name, staging / name)
+        (staging / TRAINING_KEYS_FILE).write_text(json.dumps({"models": keys, "base": base}))
+
+        # A bundle only when the current version is served from one
+        if bundle_path and (current.model_dir / Path(bundle_path).name).exists():
+            build_bundle(staging / Path(bundle_path).name, model_dir=staging)
+        os.replace(staging, target)
+
+    publish_manifest(version, os.path.relpath(target, manifest_path.parent), manifest_path)
+    logging.info(f"Model version {version} published ({', '.join(trained)} retrained)")
+    return version
+
+
+# -------------------------------------------------------
+# Pipeline
+# -------------------------------------------------------
+def train(disease, n_jobs=-1, force=False):
+    """Run (or reuse) every stage for ``disease``; returns a summary dict."""
+    if disease not in TRAINING_CONFIG:
+        raise ValueError(f"Unknown disease: {disease}. Use one of {list(TRAINING_CONFIG)}")
+    logging.basicConfig(level=logging.INFO)
+    config = TRAINING_CONFIG[disease]
+
+    matrix = stage_matrix(disease, force)
+    resampled = stage_resample(disease, matrix, config, force)
+    key, model, metrics = stage_model(disease, matrix[1], resampled, config, n_jobs, force)
+    write_biomarkers(disease, model, matrix[1])
+    return {"disease": disease, "model": key, "genes": matrix[1], **metrics}
+
+
+def train_all(diseases=None, jobs=None, n_jobs=None, force=False):
+    """
+    Train ``diseases`` (default: all) in ``jobs`` parallel processes, each
+    fitting with ``n_jobs`` threads (default: CPUs shared between jobs),
+    then publish them together as one model version.
+    """
+    diseases = list(diseases or TRAINING_CONFIG)
+    jobs = max(1, min(jobs or len(diseases), len(diseases)))
+    n_jobs = n_jobs or max(1, (os.cpu_count() or 1) // jobs)
+
+    if jobs == 1:
+        results = [train(d, n_jobs, force) for d in diseases]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(train, d, n_jobs, force) for d in diseases]
+            results = [f.result() for f in futures]
+
+    version = publish(results, force)
+    for r in results:
+        r["version"] = version
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the GeneRisk disease models")
+    parser.add_argument("diseases", nargs="*", help=f"any of {', '.join(TRAINING_CONFIG)} (default: all)")
+    parser.add_argument("--jobs", type=int, help="diseases trained in parallel processes")
+    parser.add_argument("--n-jobs", type=int, help="RandomForest threads per process")
+    parser.add_argument("--force", action="store_true", help="recompute every stage")
+    args = parser.parse_args(argv)
+
+    try:
+        results = train_all(args.diseases, args.jobs, args.n_jobs, args.force)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    for r in results:
+        auc = "n/a" if r["auc"] is None else f"{r['auc']:.4f}"
+        state = f"published as {r['version']}" if r["version"] else "unchanged"
+        print(f"✅ {r['disease']}: accuracy {r['accuracy']:.4f}, ROC-AUC {auc} (model {r['model']}, {state})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
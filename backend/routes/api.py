@@ -0,0 +1,210 @@
+import io
+import os
+import json
+import zipfile
+import numpy as np
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from backend.decorators import token_required
+from backend.metrics import STAGE_SECONDS
+
+api_bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+# Largest accepted request body, and samples predicted per streamed batch
+API_MAX_BYTES = int(os.environ.get("GENERISK_API_MAX_BYTES", 512 * 2**20))
+API_BATCH_ROWS = int(os.environ.get("GENERISK_API_BATCH_ROWS", 1024))
+
+JSON_TYPES = ("application/json",)
+NPZ_TYPES = ("application/x-npz", "application/npz")
+ARROW_TYPES = ("application/vnd.apache.arrow.stream",)
+
+
+# -------------------------------------------------------
+# Payload decoding
+# -------------------------------------------------------
+def _check_truncated():
+    """
+    Bodies without a Content-Length (chunked uploads) are cut off at
+    API_MAX_BYTES rather than rejected; one that reached it is too large.
+    """
+    if request.content_length is None and getattr(request.stream, "is_exhausted", False):
+        raise RequestEntityTooLarge()
+
+
+def _body():
+    data = request.get_data()
+    _check_truncated()
+    return data
+
+
+JSON_SHAPE = 'JSON body must be {"genes": [...], "values": [[...], ...], "samples": [...]}'
+
+
+def _read_json():
+    _body()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or "genes" not in data or "values" not in data:
+        raise ValueError(JSON_SHAPE)
+
+    genes, values, samples = data["genes"], data["values"], data.get("samples")
+    if not isinstance(genes, list) or not all(isinstance(g, str) for g in genes):
+        raise ValueError(f"genes must be a list of gene names. {JSON_SHAPE}")
+    if not isinstance(values, list) or not all(isinstance(v, list) for v in values):
+        raise ValueError(f"values must be a list of rows. {JSON_SHAPE}")
+    ragged = next((i for i, v in enumerate(values) if len(v) != len(genes)), None)
+    if ragged is not None:
+        raise ValueError(f"values row {ragged} has {len(values[ragged])} values for {len(genes)} genes")
+    if not all(isinstance(x, (int, float)) and not isinstance(x, bool) for v in values for x in v):
+        raise ValueError("values must be numbers")
+    if samples is not None and not isinstance(samples, list):
+        raise ValueError(f"samples must be a list of sample names. {JSON_SHAPE}")
+    return genes, values, samples
+
+
+def _read_npz():
+    try:
+        data = np.load(io.BytesIO(_body()), allow_pickle=False)
+    except (OSError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Invalid npz payload: {e}")
+
+    with data:
+        if "genes" not in data or "values" not in data:
+            raise ValueError("npz payload must contain 'genes' and 'values' arrays")
+        samples = data["samples"].astype(str).tolist() if "samples" in data else None
+        return data["genes"].astype(str).tolist(), data["values"], samples
+
+
+def _read_arrow():
+    from backend.prediction.columnar import table_to_matrix
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError:
+        raise ValueError("Arrow payloads need pyarrow installed on the server")
+
+    # Read straight off the request stream, without buffering the body first
+    try:
+        table = pa.ipc.open_stream(request.stream).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        _check_truncated()
+        raise ValueError(f"Invalid Arrow payload: {e}")
+    return table_to_matrix(table)
+
+
+def _read_payload():
+    """(genes, values as float32 samples x genes, sample names) of the request."""
+    if request.mimetype in JSON_TYPES:
+        genes, values, samples = _read_json()
+    elif request.mimetype in NPZ_TYPES:
+        genes, values, samples = _read_npz()
+    elif request.mimetype in ARROW_TYPES:
+        genes, values, samples = _read_arrow()
+    else:
+        raise ValueError(f"Unsupported content type: {request.mimetype}")
+
+    values = np.asarray(values, dtype=np.float32)
+    if values.ndim == 1:
+        values = values[None, :]
+    if values.ndim != 2 or values.shape[1] != len(genes):
+        raise ValueError(f"values must be samples x genes ({len(genes)} genes), got shape {values.shape}")
+    if values.shape[0] == 0:
+        raise ValueError("No samples in payload")
+
+    if samples is None:
+        samples = [str(i) for i in range(values.shape[0])]
+    if len(samples) != values.shape[0]:
+        raise ValueError(f"{len(samples)} sample names for {values.shape[0]} samples")
+
+    return [str(g) for g in genes], values, [str(s) for s in samples]
+
+
+def _too_large():
+    return jsonify({"error": f"Payload larger than {API_MAX_BYTES} bytes"}), 413
+
+
+# -------------------------------------------------------
+# Endpoints
+# -------------------------------------------------------
+@api_bp.route("/genes")
+@token_required('user', 'doctor', 'researcher')
+def genes():
+    """Genes the models use, so pipelines can send only those."""
+    from backend.prediction.preprocess import get_vocab
+    return jsonify({"genes": get_vocab().genes.tolist()})
+
+
+@api_bp.route("/predict", methods=["POST"])
+@token_required('user', 'doctor', 'researcher')
+def predict():
+    """
+    Batch prediction. Body: JSON {"genes", "values", "samples"}, an npz with
+    the same arrays, or an Arrow IPC stream (one column per gene, optional
+    "sample" column). Responds with NDJSON: one overlap header line (with
+    the number of genes matched through aliases and the model version), then
+    one line per sample.
+    ``?overlap=counts`` omits the matched gene names.
+    """
+    # Imported here so web startup does not pull in the prediction stack
+    from backend.prediction.preprocess import get_vocab
+    from backend.prediction.run_predictions import run_predictions_batch
+    from backend.prediction.registry import registry
+
+    # Enforced while reading, so chunked bodies and Arrow streams are bounded too
+    request.max_content_length = API_MAX_BYTES
+    if request.content_length and request.content_length > API_MAX_BYTES:
+        return _too_large()
+
+    names_only = request.args.get("overlap") != "counts"
+
+    # Every batch of the stream runs on the model version the request started with
+    version = registry.acquire()
+    with registry.use(version):
+        vocab = get_vocab()
+
+    def batch(start):
+        with registry.use(version):
+            with STAGE_SECONDS.time(stage="align"):
+                aligned = vocab.align_matrix(gene_names, values[start:start + API_BATCH_ROWS],
+                                             samples[start:start + API_BATCH_ROWS])
+            with STAGE_SECONDS.time(stage="predict"):
+                return aligned, run_predictions_batch(aligned)
+
+    try:
+        with STAGE_SECONDS.time(stage="parse"):
+            gene_names, values, samples = _read_payload()
+        # First batch up front, so bad input is a plain 400 and not a broken stream
+        first = batch(0)
+    except ValueError as e:
+        registry.release(version)
+        return jsonify({"error": str(e)}), 400
+    except RequestEntityTooLarge:
+        registry.release(version)
+        return _too_large()
+    except Exception:
+        registry.release(version)
+        raise
+
+    def generate():
+        aligned, (rows, shared) = first
+        names = aligned.samples
+        overlap = {d: (g if names_only else len(g)) for d, g in shared.items()}
+        yield json.dumps({"samples": len(samples), "overlap": overlap, "aliased": aligned.n_aliased,
+                          "model_version": version.version}) + "\n"
+
+        start = 0
+        while True:
+            for sample, results in zip(names, rows):
+                yield json.dumps({"sample": sample, "results": results}) + "\n"
+            start += API_BATCH_ROWS
+            if start >= len(samples):
+                break
+            try:
+                aligned, (rows, _) = batch(start)
+                names = aligned.samples
+            except ValueError as e:
+                yield json.dumps({"error": str(e)}) + "\n"
+                break
+
+    response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    response.call_on_close(lambda: registry.release(version))
+    return response
@@ -1,11 +1,29 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, jsonify, abort, flash, redirect, url_for
+from werkzeug.security import generate_password_hash
 from flask_login import login_required, current_user
+from sqlalchemy.orm import aliased
 from backend.decorators import role_required
-from backend.models import Prediction, User, SharedReport, Consultation
+from backend.models import Prediction, User, SharedReport, RiskSummary
 from backend.database import db
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
+# Recent collaborations listed, and own reports offered in the pickers
+COLLABORATION_LIMIT = 20
+REPORT_CHOICES_LIMIT = 50
+# Users are picked through /users/search instead of full lists
+USER_SEARCH_LIMIT = 20
+PROFESSIONALS_SHOWN = 3
+
+USER_ROLES = ("user", "doctor", "researcher", "admin")
+
+# Roles each role can look up in the user pickers
+SEARCHABLE_ROLES = {
+    "doctor": ("user", "researcher"),
+    "researcher": ("doctor",),
+    "user": ("doctor",),
+}
+
 @dashboard_bp.route("/dashboard")
 @login_required
 def dashboard():
@@ -17,26 +35,16 @@ def dashboard():
         total_predictions = Prediction.query.count()
         return render_template("admin_dashboard.html", total_users=total_users, total_predictions=total_predictions)
     elif current_user.role == "doctor":
-        # Get all predictions with risk analysis
-        all_predictions = Prediction.query.order_by(Prediction.timestamp.desc()).all()
-        
-        # Calculate risk statistics
-        high_risk_count = 0
-        total_patients = len(set([p.user_id for p in all_predictions]))
-        
-        for pred in all_predictions:
-            if pred.results_json:
-                import json
-                results = json.loads(pred.results_json)
-                # Count as high risk if any cancer type >= 70%
-                if any(isinstance(v, (int, float)) and v >= 70 for v in results.values()):
-                    high_risk_count += 1
+        # Risk statistics from the incrementally maintained summary row
+        summary = RiskSummary.current()
+        total_patients = db.session.query(db.func.count(db.distinct(Prediction.user_id))).scalar()
+        recent_predictions = Prediction.query.order_by(Prediction.timestamp.desc()).limit(10).all()
         
         return render_template("doctor_dashboard.html", 
-                             predictions=all_predictions[:10], 
+                             predictions=recent_predictions, 
                              total_patients=total_patients,
-                             high_risk_count=high_risk_count,
-                             total_predictions=len(all_predictions))
+                             high_risk_count=summary.high_risk_count,
+                             total_predictions=summary.total_predictions)
     elif current_user.role == "researcher":
         return render_template("researcher_dashboard.html", user_predictions=user_predictions)
     else:
@@ -64,63 +72,135 @@ def research_biomarkers():
 @login_required
 @role_required('researcher')
 def research_models():
-    return render_template("research_models.html")
+    return render_template("research_models.html", **_cross_matrix())
 
 @dashboard_bp.route("/research/cross-analysis")
 @login_required
 @role_required('researcher')
 def research_cross_analysis():
-    return render_template("research_cross_analysis.html")
+    return render_template("research_cross_analysis.html", **_cross_matrix())
+
+def _cross_matrix():
+    """
+    Stored model x dataset metrics. Pairs whose model or dataset changed are
+    re-evaluated in a background thread, never in the request.
+    """
+    from backend.prediction import evaluation
+    try:
+        matrix, datasets, pending = evaluation.cached_matrix()
+    except ValueError as e:
+        return {"matrix": {}, "datasets": [], "pending": 0, "error": str(e)}
+
+    if pending:
+        evaluation.refresh_in_background()
+    return {"matrix": matrix, "datasets": datasets, "pending": pending, "error": evaluation.refresh_error()}
+
+def _report_choices(user_id):
+    """Latest reports of ``user_id`` for the pickers (projected columns only)."""
+    return (db.session.query(Prediction.id, Prediction.filename, Prediction.timestamp)
+            .filter(Prediction.user_id == user_id)
+            .order_by(Prediction.timestamp.desc())
+            .limit(REPORT_CHOICES_LIMIT)
+            .all())
 
 @dashboard_bp.route("/collaboration")
 @login_required
 @role_required('doctor', 'researcher')
 def collaboration():
-    from backend.models import User, SharedReport, Consultation
-    
-    # Get doctors and researchers for sharing
-    doctors = User.query.filter_by(role='doctor').all()
-    researchers = User.query.filter_by(role='researcher').all()
-    patients = User.query.filter_by(role='user').all()
-    
-    # Get user's predictions for dropdown
-    user_predictions = Prediction.query.filter_by(user_id=current_user.id).order_by(Prediction.timestamp.desc()).all()
-    
-    # Get shared reports
-    shared_reports = SharedReport.query.filter(
-        (SharedReport.from_user_id == current_user.id) | 
-        (SharedReport.to_user_id == current_user.id)
-    ).order_by(SharedReport.timestamp.desc()).all()
-    
-    return render_template("collaboration.html", 
-                         doctors=doctors, 
-                         researchers=researchers,
-                         patients=patients,
-                         user_predictions=user_predictions,
-                         shared_reports=shared_reports)
+    # Shared reports with sender, recipient and report name in one query
+    sender, recipient = aliased(User), aliased(User)
+    mine = (SharedReport.from_user_id == current_user.id) | (SharedReport.to_user_id == current_user.id)
+    shared_reports = (
+        db.session.query(SharedReport.id, SharedReport.prediction_id, SharedReport.message,
+                         SharedReport.status, SharedReport.timestamp,
+                         sender.name.label("from_name"), recipient.name.label("to_name"),
+                         Prediction.filename)
+        .outerjoin(sender, sender.id == SharedReport.from_user_id)
+        .outerjoin(recipient, recipient.id == SharedReport.to_user_id)
+        .outerjoin(Prediction, Prediction.id == SharedReport.prediction_id)
+        .filter(mine)
+        .order_by(SharedReport.timestamp.desc())
+        .limit(COLLABORATION_LIMIT)
+        .all()
+    )
+    total_shared = db.session.query(db.func.count(SharedReport.id)).filter(mine).scalar()
+
+    # Professionals: counts per role plus a few names, never the full lists
+    role_counts = dict(db.session.query(User.role, db.func.count(User.id))
+                       .filter(User.role.in_(("doctor", "researcher")))
+                       .group_by(User.role).all())
+    professionals = {
+        role: db.session.query(User.id, User.name).filter(User.role == role)
+                .order_by(User.name).limit(PROFESSIONALS_SHOWN).all()
+        for role in ("doctor", "researcher")
+    }
+
+    return render_template("collaboration.html",
+                         role_counts=role_counts,
+                         professionals=professionals,
+                         user_predictions=_report_choices(current_user.id),
+                         shared_reports=shared_reports,
+                         total_shared=total_shared)
 
 @dashboard_bp.route("/patient/consult")
 @login_required
 @role_required('user')
 def patient_consult():
-    from backend.models import User
-    
-    # Get available doctors
-    doctors = User.query.filter_by(role='doctor').all()
-    
-    # Get patient's predictions for consultation
-    patient_predictions = Prediction.query.filter_by(user_id=current_user.id).order_by(Prediction.timestamp.desc()).all()
-    
-    return render_template("patient_consult.html", 
-                         doctors=doctors,
-                         patient_predictions=patient_predictions)
+    # Doctors are picked through /users/search
+    return render_template("patient_consult.html",
+                         patient_predictions=_report_choices(current_user.id))
+
+@dashboard_bp.route("/users/search")
+@login_required
+@role_required('doctor', 'researcher', 'user')
+def search_users():
+    """Typeahead for the user pickers: ?role=doctor&q=<name prefix>."""
+    role = request.args.get("role", "")
+    if role not in SEARCHABLE_ROLES.get(current_user.role, ()):
+        abort(403)
+
+    query = db.session.query(User.id, User.name).filter(User.role == role)
+    prefix = request.args.get("q", "").strip()
+    if prefix:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(User.name.ilike(f"{escaped}%", escape="\\"))
+
+    users = query.order_by(User.name).limit(USER_SEARCH_LIMIT).all()
+    return jsonify([{"id": u.id, "name": u.name} for u in users])
 
 @dashboard_bp.route("/admin/users")
 @login_required
 @role_required('admin')
 def admin_users():
     users = User.query.all()
-    return render_template("admin_users.html", users=users)
+    return render_template("admin_users.html", users=users, roles=USER_ROLES)
+
+@dashboard_bp.route("/admin/users/<int:user_id>", methods=["POST"])
+@login_required
+@role_required('admin')
+def admin_update_user(user_id):
+    """Change a user's role and/or reset their password."""
+    user = db.session.get(User, user_id)
+    if user is None:
+        abort(404)
+
+    role = request.form.get("role", user.role)
+    if role not in USER_ROLES:
+        flash(f"Unknown role: {role}", "error")
+        return redirect(url_for("dashboard.admin_users"))
+    if user.id == current_user.id and role != "admin":
+        flash("You cannot remove your own admin role", "error")
+        return redirect(url_for("dashboard.admin_users"))
+
+    user.role = role
+    password = request.form.get("password", "")
+    if password:
+        user.password = generate_password_hash(password)
+    # The User update event drops this user from the identity cache
+    db.session.commit()
+
+    flash(f"Updated {user.name}", "success")
+    return redirect(url_for("dashboard.admin_users"))
 
 @dashboard_bp.route("/admin/analytics")
 @login_required
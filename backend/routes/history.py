@@ -1,28 +1,118 @@
-from flask import Blueprint, render_template
-from backend.models import Prediction
+from flask import Blueprint, render_template, request, jsonify, abort, flash, redirect, url_for, send_file
+from backend.models import Prediction, CANCER_TYPES
+from backend.export import predictions_parquet
 from flask_login import login_required, current_user
-import json
+from datetime import datetime
+import io
 
 history_bp = Blueprint("history", __name__)
 
-@history_bp.route("/history")
-@login_required
-def history():
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_RISK = 100.0
+
+
+def _history_query():
     if current_user.role == 'doctor':
         # Doctors see all predictions from all users
-        data = Prediction.query.order_by(Prediction.timestamp.desc()).all()
+        query = Prediction.query
     else:
         # Other roles see only their own predictions
-        data = Prediction.query.filter_by(user_id=current_user.id).order_by(Prediction.timestamp.desc()).all()
+        query = Prediction.query.filter_by(user_id=current_user.id)
+
+    # Optional filters, served by the indexed risk columns. Risks are
+    # percentages; the closed range lets SQLite pick the (risk, timestamp)
+    # index instead of scanning every row in timestamp order.
+    cancer = request.args.get("cancer")
+    min_risk = request.args.get("min_risk", type=float)
+
+    if cancer and cancer not in CANCER_TYPES:
+        abort(400)
+    if min_risk is not None or cancer:
+        column = getattr(Prediction, f"{cancer}_prob") if cancer else Prediction.max_risk
+        query = query.filter(column.between(min_risk if min_risk is not None else 0.0, MAX_RISK))
+
+    return query
+
+
+def _page(query, cursor=None, limit=PAGE_SIZE):
+    """
+    Keyset pagination on (timestamp, id), newest first. ``cursor`` is the
+    "<iso timestamp>|<id>" of the last item of the previous page.
+    """
+    if cursor:
+        try:
+            ts, last_id = cursor.rsplit("|", 1)
+            ts, last_id = datetime.fromisoformat(ts), int(last_id)
+        except ValueError:
+            abort(400)
+        query = query.filter(
+            (Prediction.timestamp < ts) | ((Prediction.timestamp == ts) & (Prediction.id < last_id))
+        )
+
+    rows = query.order_by(Prediction.timestamp.desc(), Prediction.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1].timestamp.isoformat()}|{rows[-1].id}"
+
+    return rows, next_cursor
+
+
+@history_bp.route("/history")
+@login_required
+def history():
+    data, next_cursor = _page(_history_query())
 
     formatted = [
         {
             "filename": p.filename,
             "timestamp": p.timestamp,
-            "results": json.loads(p.results_json) if p.results_json else {},
+            "results": p.results(),
             "user_id": p.user_id
         }
         for p in data
     ]
 
-    return render_template("history.html", items=formatted, user_role=current_user.role)
+    return render_template("history.html", items=formatted, user_role=current_user.role,
+                           next_cursor=next_cursor, filters=request.args)
+
+
+@history_bp.route("/history/api")
+@login_required
+def history_api():
+    limit = min(request.args.get("limit", PAGE_SIZE, type=int), MAX_PAGE_SIZE)
+    data, next_cursor = _page(_history_query(), request.args.get("cursor"), max(limit, 1))
+
+    return jsonify({
+        "items": [
+            {
+                "id": p.id,
+                "filename": p.filename,
+                "timestamp": p.timestamp.isoformat(),
+                "results": p.results(),
+                "max_risk": p.max_risk,
+                "high_risk": bool(p.high_risk),
+                "model_version": p.model_version,
+                "user_id": p.user_id,
+            }
+            for p in data
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@history_bp.route("/history/export.parquet")
+@login_required
+def history_export():
+    """Every history row matching the current filters, as Parquet."""
+    query = _history_query().order_by(Prediction.timestamp.desc(), Prediction.id.desc())
+    try:
+        data = predictions_parquet(query)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("history.history", **request.args))
+
+    return send_file(io.BytesIO(data), mimetype="application/vnd.apache.parquet",
+                     as_attachment=True, download_name="history.parquet")
@@ -0,0 +1,13 @@
+from flask import Blueprint, Response
+from flask_login import login_required
+from backend.decorators import role_required
+from backend import metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics")
+@login_required
+@role_required('admin')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
@@ -1,11 +1,10 @@
-from flask import Blueprint, request, redirect, render_template, flash
+from flask import Blueprint, request, redirect, render_template, flash, url_for, jsonify, abort, current_app, send_file
 from flask_login import current_user, login_required
-from backend.models import Prediction
-from backend.database import db
-from backend.prediction.run_predictions import run_predictions
-from backend.prediction.preprocess import preprocess_data
+from backend.models import Prediction, Job
 from backend.decorators import role_required
-import json
+from backend import jobs
+from backend.export import predictions_parquet
+import io
 
 upload_bp = Blueprint("upload", __name__)
 
@@ -15,29 +14,100 @@ upload_bp = Blueprint("upload", __name__)
 def upload():
     if request.method == "POST":
         file = request.files["file"]
-        
+
         if not file or file.filename == '':
             flash("Please select a file", "error")
             return render_template("index.html")
 
         try:
-            processed = preprocess_data(file)
-            results, shared = run_predictions(processed)
-
-            p = Prediction(
-                filename=file.filename,
-                results_json=json.dumps(results),
-                shared_json=json.dumps(shared),
-                user_id=current_user.id
-            )
-            db.session.add(p)
-            db.session.commit()
-            
-            flash("Prediction completed successfully!", "success")
-            return render_template("result.html", results=results, shared_genes=shared, user_role=current_user.role)
-        
+            job = jobs.submit_upload(current_app._get_current_object(), file, current_user.id,
+                                     cohort=bool(request.form.get("cohort")))
         except Exception as e:
             flash(f"Error processing file: {str(e)}", "error")
             return render_template("index.html")
 
+        return redirect(url_for("upload.job_page", job_id=job.id))
+
     return render_template("index.html")
+
+
+def _own_job(job_id):
+    job = Job.query.get(job_id)
+    if job is None or job.user_id != current_user.id:
+        abort(404)
+    return job
+
+
+def _sample_name(job):
+    """Cohort predictions are stored as "<filename> [<sample>]"."""
+    prefix = f"{job.filename} ["
+    return lambda filename: filename[len(prefix):-1] if filename.startswith(prefix) else filename
+
+
+@upload_bp.route("/jobs/<int:job_id>/status")
+@login_required
+def job_status(job_id):
+    job = _own_job(job_id)
+    return jsonify({
+        "id": job.id,
+        "status": job.status,
+        "error": job.error,
+        "filename": job.filename,
+        "sample_count": job.sample_count,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "result_url": url_for("upload.job_page", job_id=job.id) if job.status == "done" else None,
+    })
+
+
+@upload_bp.route("/jobs/<int:job_id>")
+@login_required
+def job_page(job_id):
+    job = _own_job(job_id)
+
+    if job.status == "failed":
+        flash(f"Error processing file: {job.error}", "error")
+        return render_template("index.html")
+
+    if job.status != "done":
+        return render_template("job_status.html", job=job)
+
+    predictions = Prediction.query.filter_by(job_id=job.id).order_by(Prediction.id).all()
+    shared = predictions[0].shared_genes() if predictions else {}
+
+    if not job.cohort:
+        flash("Prediction completed successfully!", "success")
+        return render_template("result.html",
+                             results=predictions[0].results(),
+                             shared_genes=shared,
+                             user_role=current_user.role)
+
+    sample_name = _sample_name(job)
+    samples = [(sample_name(p.filename), p.results()) for p in predictions]
+    flash(f"Cohort prediction completed for {len(samples)} samples!", "success")
+    return render_template("cohort_result.html",
+                         job=job,
+                         filename=job.filename,
+                         samples=samples,
+                         shared_genes=shared,
+                         user_role=current_user.role)
+
+
+@upload_bp.route("/jobs/<int:job_id>/export.parquet")
+@login_required
+def job_export(job_id):
+    """Per-sample risk scores of a finished job, as Parquet."""
+    job = _own_job(job_id)
+    if job.status != "done":
+        abort(404)
+
+    query = Prediction.query.filter_by(job_id=job.id).order_by(Prediction.id)
+    try:
+        data = predictions_parquet(query, sample_name=_sample_name(job))
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("upload.job_page", job_id=job.id))
+
+    stem = job.filename.rsplit(".", 1)[0] or "results"
+    return send_file(io.BytesIO(data), mimetype="application/vnd.apache.parquet",
+                     as_attachment=True, download_name=f"{stem}_risk.parquet")
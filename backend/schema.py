@@ -0,0 +1,66 @@
+import json
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from backend.database import db
+from backend.models import Prediction, RiskSummary
+
+
+def upgrade_schema():
+    """
+    Bring an existing database up to the current models.
+
+    db.create_all() only creates missing tables; this also adds columns and
+    indexes that were introduced after a table was first created.
+    """
+    db.create_all()
+
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {ddl}'))
+
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+
+    backfill_risk_summary()
+
+
+def backfill_risk_summary(batch_size=1000):
+    """
+    One-off migration for databases created before the risk columns existed:
+    fill breast/ovarian/lung_prob, max_risk and high_risk from results_json,
+    then build the RiskSummary row from aggregate queries.
+    """
+    if RiskSummary.query.get(1) is not None:
+        return
+
+    last_id = 0
+    while True:
+        batch = (Prediction.query
+                 .filter(Prediction.id > last_id, Prediction.max_risk.is_(None))
+                 .order_by(Prediction.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+        for p in batch:
+            results = json.loads(p.results_json) if p.results_json else {}
+            for column, value in Prediction.risk_columns(results).items():
+                setattr(p, column, value)
+        last_id = batch[-1].id
+        db.session.commit()
+
+    total = Prediction.query.count()
+    high = Prediction.query.filter(Prediction.high_risk.is_(True)).count()
+    db.session.add(RiskSummary(id=1, total_predictions=total, high_risk_count=high))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()  # another worker starting up seeded it first
@@ -0,0 +1,9 @@
+"""
+WSGI entry point for serving, e.g. ``gunicorn -w 4 backend.wsgi:app``
+(without --preload, so each worker starts its own job pool).
+"""
+from backend.app import create_app
+from backend import jobs
+
+app = create_app()
+jobs.start_workers(app)
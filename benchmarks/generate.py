@@ -0,0 +1,179 @@
+"""
+Synthetic expression uploads for the benchmark suite.
+
+Every supported upload shape can be generated at any size. Files contain the
+real model genes (backend/models/*_genes.json) plus filler genes the models
+do not know, so parsing and filtering do realistic work at every size.
+
+    python -m benchmarks.generate long 10MB benchmarks/data/long_10MB.tsv
+"""
+import gzip
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from backend.prediction.genes import get_model_genes
+
+# shape -> (file extension, largest size that makes sense for the shape)
+SHAPES = {
+    "wide": (".csv", 50 * 2**20),          # one sample, genes as columns
+    "long": (".tsv", None),                # gene / value rows
+    "gzip": (".tsv.gz", None),             # gene / value rows, gzip-compressed
+    "microarray": (".txt", None),          # probe / genesymbol / intensity rows
+    "probes": (".txt", None),              # ID_REF / VALUE rows (needs a probe index)
+    "cohort": (".txt", None),              # genes x samples series matrix
+}
+
+COHORT_SAMPLES = 16
+PROBES_PER_GENE = 3
+BLOCK_ROWS = 100_000
+
+
+# -------------------------------------------------------
+# Sizes
+# -------------------------------------------------------
+UNITS = {"KB": 2**10, "MB": 2**20, "GB": 2**30, "B": 1}
+
+
+def parse_size(text):
+    """'1KB' / '500MB' / '2048' -> bytes."""
+    text = str(text).strip().upper()
+    for unit, factor in UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def format_size(n):
+    for unit in ("GB", "MB", "KB"):
+        if n >= UNITS[unit] and n % UNITS[unit] == 0:
+            return f"{n // UNITS[unit]}{unit}"
+    return f"{n}B"
+
+
+# -------------------------------------------------------
+# Gene names
+# -------------------------------------------------------
+def model_genes(seed=0):
+    genes = np.array(get_model_genes(), dtype=object)
+    np.random.default_rng(seed).shuffle(genes)
+    return genes
+
+
+def gene_stream(seed=0):
+    """Model genes (shuffled) first, then endless filler genes."""
+    yield from model_genes(seed)
+    i = 0
+    while True:
+        yield f"FILLER{i}"
+        i += 1
+
+
+def _take(it, n):
+    return np.array([next(it) for _ in range(n)], dtype=object)
+
+
+# -------------------------------------------------------
+# Writers
+# -------------------------------------------------------
+def _write_rows(f, size, make_block, header):
+    """Write ``header`` then blocks of rows until ``size`` bytes are written."""
+    written = f.write(header.encode())
+    block = 0
+    while written < size:
+        text = make_block(block)
+        remaining = size - written
+        if len(text) > remaining:
+            # Cut at a line boundary, keep at least one data row
+            cut = text.rfind("\n", 0, remaining)
+            text = text[:cut + 1] if cut > 0 else text[:text.find("\n") + 1]
+        written += f.write(text.encode())
+        block += 1
+    return written
+
+
+def _frame_text(df):
+    return df.to_csv(sep="\t", header=False, index=False, float_format="%.4f")
+
+
+def write_upload(shape, size, path, seed=0):
+    """Write a synthetic ``shape`` upload of about ``size`` bytes to ``path``."""
+    rng = np.random.default_rng(seed)
+    genes = gene_stream(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if shape == "wide":
+        # ~16 bytes per gene (name + value in two rows)
+        n = max(size // 16, 1)
+        names = _take(genes, n)
+        df = pd.DataFrame([rng.random(n).round(4)], columns=names)
+        df.to_csv(path, index=False)
+        return path
+
+    opener = gzip.open if shape == "gzip" else open
+    with opener(path, "wb") as f:
+        if shape in ("long", "gzip"):
+            header = "gene\tvalue\n"
+            block = lambda _: _frame_text(pd.DataFrame({"gene": _take(genes, BLOCK_ROWS),
+                                                        "value": rng.random(BLOCK_ROWS)}))
+
+        elif shape == "microarray":
+            header = "ID\tgenesymbol\tintensity\n"
+            def block(b):
+                symbols = np.repeat(_take(genes, BLOCK_ROWS // PROBES_PER_GENE), PROBES_PER_GENE)
+                probes = [f"{b * len(symbols) + i}_at" for i in range(len(symbols))]
+                return _frame_text(pd.DataFrame({"ID": probes, "genesymbol": symbols,
+                                                 "intensity": rng.random(len(symbols))}))
+
+        elif shape == "probes":
+            header = "ID_REF\tVALUE\n"
+            def block(b):
+                probes = [f"{b * BLOCK_ROWS + i}_at" for i in range(BLOCK_ROWS)]
+                return _frame_text(pd.DataFrame({"ID_REF": probes, "VALUE": rng.random(BLOCK_ROWS)}))
+
+        elif shape == "cohort":
+            samples = [f"GSM{i}" for i in range(COHORT_SAMPLES)]
+            header = "!Series_title\t\"synthetic\"\n" + "\t".join(["ID_REF"] + samples) + "\n"
+            def block(_):
+                df = pd.DataFrame(rng.random((BLOCK_ROWS // 10, COHORT_SAMPLES)), columns=samples)
+                df.insert(0, "ID_REF", _take(genes, len(df)))
+                return _frame_text(df)
+
+        else:
+            raise ValueError(f"Unknown shape: {shape}")
+
+        _write_rows(f, size, block, header)
+    return path
+
+
+def write_annotation(path, n_probes, seed=0):
+    """
+    GPL-style .annot file for the "probes" shape: probe "<i>_at" maps to the
+    gene the microarray shape would put on the same row, some probes to two
+    genes ("A /// B").
+    """
+    rng = np.random.default_rng(seed)
+    genes = gene_stream(seed)
+    symbols = np.repeat(_take(genes, -(-n_probes // PROBES_PER_GENE)), PROBES_PER_GENE)[:n_probes]
+    multi = rng.random(n_probes) < 0.05
+    partners = rng.permutation(symbols)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        f.write("^Annotation\n!Annotation_platform = GPLSYN\n!platform_table_begin\n")
+        f.write("ID\tGene title\tGene symbol\n")
+        for i, (g, m, p) in enumerate(zip(symbols, multi, partners)):
+            f.write(f"{i}_at\tsynthetic\t{g} /// {p}\n" if m else f"{i}_at\tsynthetic\t{g}\n")
+        f.write("!platform_table_end\n")
+    return path
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.generate <shape> <size> <path>
+    if len(sys.argv) != 4 or sys.argv[1] not in SHAPES:
+        print(f"usage: python -m benchmarks.generate [{'|'.join(SHAPES)}] <size> <path>")
+        sys.exit(1)
+    out = write_upload(sys.argv[1], parse_size(sys.argv[2]), sys.argv[3])
+    print(f"✅ {out} ({out.stat().st_size} bytes)")
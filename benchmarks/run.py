@@ -0,0 +1,258 @@
+"""
+Inference benchmark runner.
+
+Generates synthetic uploads (benchmarks.generate) and times, per shape and
+size, every stage an upload goes through:
+
+    load     - model registry load (cold, in a fresh process)
+    parse    - reading / filtering the upload (preprocess_data / _cohort)
+    align    - scattering the parsed genes onto the vocabulary
+    predict  - run_predictions_batch (prediction cache disabled)
+    db_write - jobs.write_predictions into a scratch SQLite database
+
+Each case runs in its own subprocess so peak RSS is per case. Results can be
+saved as a JSON baseline and compared against one later:
+
+    python -m benchmarks.run --sizes 1KB,10MB --save benchmarks/baselines/local.json
+    python -m benchmarks.run --sizes 1KB,10MB --compare benchmarks/baselines/local.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from benchmarks.generate import SHAPES, parse_size, format_size, write_upload, write_annotation
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_WORKDIR = BENCH_DIR / "data"
+DEFAULT_SIZES = "1KB,100KB,10MB,500MB"
+STAGES = ("load", "parse", "align", "predict", "db_write")
+PERCENTILES = (50, 90, 99)
+
+# Differences below this are noise, whatever the relative change (seconds)
+NOISE_FLOOR = 0.002
+
+
+# -------------------------------------------------------
+# Statistics
+# -------------------------------------------------------
+def summarize(samples):
+    import numpy as np
+    values = np.asarray(samples, dtype=float)
+    stats = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+    stats["mean"] = float(values.mean())
+    stats["n"] = len(values)
+    return stats
+
+
+def peak_rss_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+# -------------------------------------------------------
+# One case (runs in the child process)
+# -------------------------------------------------------
+def measure(shape, path, repeat):
+    import tempfile
+    from flask import Flask
+    from werkzeug.datastructures import FileStorage
+    from backend.database import db
+    from backend import database
+    from backend.models import Job
+    from backend import jobs
+    from backend.prediction import preprocess
+    from backend.prediction.registry import registry
+    from backend.prediction.run_predictions import run_predictions_batch
+
+    timings = {stage: [] for stage in STAGES}
+
+    # Time the alignment step separately from parsing
+    align_columns = preprocess._align_columns
+    align_time = []
+
+    def timed_align(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return align_columns(*args, **kwargs)
+        finally:
+            align_time.append(time.perf_counter() - start)
+
+    preprocess._align_columns = timed_align
+
+    scratch = tempfile.TemporaryDirectory()
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{scratch.name}/bench.db"
+    database.init_app(app)
+
+    samples = 0
+    with app.app_context():
+        db.create_all()
+
+        for _ in range(repeat):
+            registry.clear()
+            start = time.perf_counter()
+            registry.vocab()
+            timings["load"].append(time.perf_counter() - start)
+
+            with open(path, "rb") as stream:
+                upload = FileStorage(stream=stream, filename=Path(path).name)
+                start = time.perf_counter()
+                if shape == "cohort":
+                    processed = preprocess.preprocess_cohort(upload)
+                else:
+                    processed = preprocess.preprocess_data(upload)
+                total = time.perf_counter() - start
+            timings["align"].append(align_time[-1])
+            timings["parse"].append(total - align_time[-1])
+
+            start = time.perf_counter()
+            rows, shared = run_predictions_batch(processed)
+            timings["predict"].append(time.perf_counter() - start)
+
+            job = Job(filename=Path(path).name, cohort=shape == "cohort", user_id=1, status="running")
+            db.session.add(job)
+            db.session.flush()
+            start = time.perf_counter()
+            jobs.write_predictions(job, processed.samples, rows, shared)
+            db.session.commit()
+            timings["db_write"].append(time.perf_counter() - start)
+            samples = len(rows)
+
+    scratch.cleanup()
+    return {
+        "samples": samples,
+        "stages": {stage: summarize(values) for stage, values in timings.items()},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+# -------------------------------------------------------
+# Orchestration (parent process)
+# -------------------------------------------------------
+def ensure_upload(workdir, shape, size):
+    ext, _ = SHAPES[shape]
+    path = (workdir / f"{shape}_{format_size(size)}{ext}").resolve()
+    if not path.exists():
+        print(f"  generating {path.name} ...", flush=True)
+        write_upload(shape, size, path)
+    return path
+
+
+def ensure_probe_index(workdir):
+    """Probe index built from a synthetic GPL annotation, for the "probes" shape."""
+    from backend.prediction.genes import get_model_genes
+    from backend.prediction.probes import build_probe_index
+
+    index_path = workdir / "probe_index.npz"
+    if not index_path.exists():
+        annot = write_annotation(workdir / "GPLSYN.annot", 2 * 3 * len(get_model_genes()))
+        build_probe_index([annot]).save(index_path)
+    return index_path
+
+
+def run_case(shape, path, repeat, env):
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--child", shape, str(path), str(repeat)],
+        capture_output=True, text=True, env=env, cwd=BENCH_DIR.parent,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{shape} {path.name} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of p50 latency against ``baseline`` beyond ``tolerance``."""
+    previous = {(r["shape"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get((r["shape"], r["size"]))
+        if old is None:
+            continue
+        for stage in STAGES:
+            new_p50 = r["stages"][stage]["p50"]
+            old_p50 = old["stages"][stage]["p50"]
+            if new_p50 - old_p50 > NOISE_FLOOR and new_p50 > old_p50 * (1 + tolerance):
+                regressions.append(f"{r['shape']} {r['size']} {stage}: "
+                                   f"{old_p50 * 1000:.1f} ms -> {new_p50 * 1000:.1f} ms")
+        if r["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{r['shape']} {r['size']} peak RSS: "
+                               f"{old['peak_rss_mb']} MB -> {r['peak_rss_mb']} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GeneRisk inference benchmarks")
+    parser.add_argument("--shapes", default=",".join(SHAPES), help="comma-separated upload shapes")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated file sizes, e.g. 1KB,10MB")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR, help="where generated uploads are kept")
+    parser.add_argument("--save", type=Path, help="write results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--child", nargs=3, metavar=("SHAPE", "PATH", "REPEAT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        shape, path, repeat = args.child
+        print(json.dumps(measure(shape, path, int(repeat))))
+        return 0
+
+    shapes = [s for s in args.shapes.split(",") if s]
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s]
+    args.workdir.mkdir(parents=True, exist_ok=True)
+
+    env = dict(os.environ, GENERISK_CACHE="0", GENERISK_JOB_WORKERS="0")
+    if "probes" in shapes:
+        env["GENERISK_PROBE_INDEX"] = str(ensure_probe_index(args.workdir))
+
+    results = []
+    for shape in shapes:
+        _, max_size = SHAPES[shape]
+        for size in sizes:
+            if max_size is not None and size > max_size:
+                print(f"- {shape} {format_size(size)}: skipped (larger than {format_size(max_size)})")
+                continue
+
+            path = ensure_upload(args.workdir, shape, size)
+            result = run_case(shape, path, args.repeat, env)
+            result.update(shape=shape, size=format_size(size), bytes=path.stat().st_size)
+            results.append(result)
+
+            stages = "  ".join(f"{s} {result['stages'][s]['p50'] * 1000:.1f}ms" for s in STAGES)
+            print(f"- {shape} {format_size(size)} ({result['samples']} samples): {stages}  "
+                  f"peak RSS {result['peak_rss_mb']} MB", flush=True)
+
+    report = {
+        "created": datetime.utcnow().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "settings": {k: v for k, v in env.items() if k.startswith("GENERISK_")},
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(report, indent=2))
+        print(f"✅ Baseline saved to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            return 1
+        print(f"✅ No regressions against {args.compare}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Issue a prediction API token for an existing user:
+
+    python create_api_token.py pipeline@lab.org "sequencing pipeline"
+"""
+import sys
+from backend.app import create_app
+from backend.models import User, ApiToken
+
+if len(sys.argv) < 2:
+    print("usage: python create_api_token.py <email> [token name]")
+    sys.exit(1)
+
+app = create_app()
+
+with app.app_context():
+    user = User.query.filter_by(email=sys.argv[1]).first()
+    if user is None:
+        print(f"❌ No user with email {sys.argv[1]}")
+        sys.exit(1)
+
+    row, token = ApiToken.issue(user, name=sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"✅ Token {row.prefix}… created for {user.email} ({user.role})")
+    print(f"   {token}")
+    print("   Store it now, it cannot be shown again.")
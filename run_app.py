@@ -6,6 +6,7 @@ Quick start script for GeneRisk AI
 import os
 import sys
 from backend.app import create_app
+from backend import jobs
 from backend.database import db
 from backend.models import User
 from werkzeug.security import generate_password_hash
@@ -48,6 +49,10 @@ def setup_and_run():
         else:
             print("✅ Demo users already exist")
     
+    # Resume interrupted prediction jobs, only in the reloader's serving child
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        jobs.start_workers(app)
+
     print("\n🚀 GeneRisk AI is running!")
     print("📍 Open your browser and go to: http://localhost:5000")
     print("\n🔐 Demo Login Credentials:")
@@ -0,0 +1,73 @@
+import sqlite3
+import time
+
+import pytest
+
+from backend.prediction import cache as cache_module
+from backend.prediction.cache import PredictionCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "prediction_cache.db")
+
+
+def worker(path, fingerprints, monkeypatch):
+    """A PredictionCache whose model fingerprint is the next item of ``fingerprints``."""
+    sequence = iter(fingerprints)
+    cache = PredictionCache(size=16, path=path, ttl=60)
+    monkeypatch.setattr(cache_module, "model_fingerprint", lambda model_dir: next(sequence))
+    return cache
+
+
+def test_workers_on_different_versions_keep_each_others_entries(path, monkeypatch):
+    old = worker(path, ["fp-old"] * 2, monkeypatch)
+    old.put("r:a", {"breast": 10.0}, old.fingerprint())
+
+    new = worker(path, ["fp-new"] * 2, monkeypatch)
+    new.put("r:b", {"breast": 20.0}, new.fingerprint())
+
+    # Both entries survive; fresh caches read them from disk
+    assert PredictionCache(path=path).get("r:a") == {"breast": 10.0}
+    assert PredictionCache(path=path).get("r:b") == {"breast": 20.0}
+
+
+def test_fingerprint_change_keeps_the_memory_tier(path, monkeypatch):
+    cache = worker(path, ["fp-1", "fp-2", "fp-1"], monkeypatch)
+    cache.put("r:a", {"lung": 1.0}, cache.fingerprint())
+
+    assert cache.fingerprint() == "fp-2"
+    assert cache.fingerprint() == "fp-1"
+    assert cache.get("r:a") == {"lung": 1.0}
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_expire_after_the_ttl(path):
+    cache = PredictionCache(path=path, ttl=60)
+    cache.put_many([("r:a", {"x": 1}), ("r:b", {"x": 2})], "fp")
+    now = time.time()
+
+    assert cache.expire(now) == 0
+    # A disk hit refreshes its entry
+    assert PredictionCache(path=path).get("r:a") == {"x": 1}
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE prediction_cache SET used_at = used_at - 120 WHERE key = 'r:b'")
+    conn.commit()
+
+    assert cache.expire(now) == 1
+    assert PredictionCache(path=path).get("r:a") == {"x": 1}
+    assert PredictionCache(path=path).get("r:b") is None
+
+
+def test_cache_files_without_used_at_are_upgraded(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE prediction_cache (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, value TEXT NOT NULL)")
+    conn.execute("INSERT INTO prediction_cache VALUES ('r:old', 'fp', '{}')")
+    conn.commit()
+
+    # The first write sweeps expired entries, which includes every legacy row
+    cache = PredictionCache(path=path, ttl=60)
+    cache.put("r:new", {"x": 1}, "fp")
+
+    assert PredictionCache(path=path).get("r:old") is None
+    assert PredictionCache(path=path).get("r:new") == {"x": 1}
@@ -0,0 +1,62 @@
+import threading
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from backend.prediction import executor
+from backend.prediction.forest import CompiledForest
+
+
+@pytest.fixture
+def four_threads():
+    before = executor.threads()
+    executor.configure(4)
+    yield
+    executor.configure(before)
+
+
+@pytest.mark.parametrize("n_estimators, threads, chunks", [
+    (40, 4, 4),     # one chunk per thread
+    (40, 1, 1),
+    (40, 16, 5),    # chunks never drop below MIN_TREES_PER_CHUNK trees
+    (100, 3, 3),
+    (5, 4, 1),
+])
+def test_tree_chunks(monkeypatch, n_estimators, threads, chunks):
+    monkeypatch.setattr(executor, "MIN_TREES_PER_CHUNK", 8)
+    assert executor.tree_chunks(n_estimators, threads) == chunks
+
+
+def test_pool_results_match_serial(four_threads):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 10)).astype(np.float32)
+    y = (X[:, 0] > 0).astype(int)
+    forest = RandomForestClassifier(n_estimators=40, max_depth=6, random_state=0, n_jobs=-1).fit(X, y)
+    compiled = CompiledForest.from_sklearn(forest)
+    expected = compiled.predict_proba(X)
+
+    assert np.array_equal(executor.predict_proba(compiled, X), expected)
+    assert np.array_equal(executor.predict_proba(forest, X), expected)
+
+
+def test_pool_runs_sklearn_trees_in_the_calling_thread(four_threads, monkeypatch):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(50, 10))
+    forest = RandomForestClassifier(n_estimators=8, random_state=0, n_jobs=-1).fit(X, X[:, 0] > 0)
+
+    threads = set()
+    tree_proba = DecisionTreeClassifier.predict_proba
+
+    def spy(self, *args, **kwargs):
+        threads.add(threading.current_thread())
+        return tree_proba(self, *args, **kwargs)
+
+    monkeypatch.setattr(DecisionTreeClassifier, "predict_proba", spy)
+    executor.predict_proba(forest, X)
+
+    # The pool runs models concurrently, so sklearn adds no threads of its
+    # own, and the shared model keeps its setting for other callers
+    assert threads == {threading.current_thread()}
+    assert forest.n_jobs == -1
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from backend.prediction.forest import CompiledForest, used_features
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    """A small sklearn forest trained with missing values, float32 inputs and its own probabilities for them."""
+    rng = np.random.default_rng(0)
+    genes = [f"G{i}" for i in range(40)]
+    X = rng.normal(size=(300, len(genes))).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    y = np.where(np.nan_to_num(X[:, 0]) + np.nan_to_num(X[:, 3]) > 0, "high", "low")
+
+    forest = RandomForestClassifier(n_estimators=25, max_depth=8, max_features=5, random_state=0, n_jobs=1)
+    forest.fit(pd.DataFrame(X, columns=genes), y)
+
+    X_test = rng.normal(size=(200, len(genes))).astype(np.float32)
+    X_test[rng.random(X_test.shape) < 0.05] = np.nan
+
+    # Rows sitting exactly on split thresholds (rounded to float32, as sklearn does)
+    for est in forest.estimators_[:5]:
+        internal = (est.tree_.children_left != -1) & np.isfinite(est.tree_.threshold)
+        for f, t in zip(est.tree_.feature[internal], est.tree_.threshold[internal]):
+            X_test[rng.integers(len(X_test)), f] = np.float32(t)
+
+    X_frame = pd.DataFrame(X_test, columns=genes)
+    return forest, X_test, forest.predict_proba(X_frame), forest.predict(X_frame)
+
+
+def test_predict_proba_matches_sklearn_exactly(fitted):
+    forest, X, expected, labels = fitted
+    compiled = CompiledForest.from_sklearn(forest)
+
+    assert np.array_equal(compiled.predict_proba(X), expected)
+    assert np.array_equal(compiled.predict(X), labels)
+    assert list(compiled.feature_names_in_) == list(forest.feature_names_in_)
+
+
+def test_tree_chunks_do_not_change_the_result(fitted):
+    forest, X, expected, _ = fitted
+    compiled = CompiledForest.from_sklearn(forest)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        chunked = compiled.predict_proba(X, map=pool.map, chunks=4)
+    assert np.array_equal(chunked, expected)
+
+
+def test_pruned_forest_takes_only_used_features(fitted):
+    forest, X, expected, _ = fitted
+    compiled = CompiledForest.from_sklearn(forest)
+    used = used_features(forest)
+
+    assert np.array_equal(compiled.used_features(), used)
+
+    pruned = compiled.prune()
+    assert pruned.n_features_in_ == len(used)
+    assert list(pruned.feature_names_in_) == list(forest.feature_names_in_[used])
+    assert np.array_equal(pruned.predict_proba(X[:, used]), expected)
+
+
+def test_save_and_load_round_trip(fitted, tmp_path):
+    forest, X, expected, _ = fitted
+    path = tmp_path / "forest.npz"
+    CompiledForest.from_sklearn(forest).prune().save(path)
+
+    loaded = CompiledForest.load(path)
+    used = used_features(forest)
+    assert np.array_equal(loaded.predict_proba(X[:, used]), expected)
+    assert list(loaded.classes_) == list(forest.classes_)
+
+
+def test_wrong_feature_count_is_rejected(fitted):
+    forest, X, expected, _ = fitted
+    with pytest.raises(ValueError):
+        CompiledForest.from_sklearn(forest).predict_proba(X[:, :-1])
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from werkzeug.exceptions import BadRequest
+
+from backend import database
+from backend.database import db
+from backend.models import Prediction
+from backend.routes.history import _page
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'history.db'}"
+    database.init_app(app)
+
+    # 23 predictions over 8 timestamps, so pages split rows that share one
+    start = datetime(2026, 1, 1, 12, 0, 0)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(
+            Prediction(filename=f"p{i}.csv", user_id=1 + i % 2, timestamp=start + timedelta(seconds=i // 3),
+                       max_risk=float(i))
+            for i in range(23)
+        )
+        db.session.commit()
+
+    with app.test_request_context():
+        yield app
+
+
+def newest_first(query):
+    return [p.id for p in query.order_by(Prediction.timestamp.desc(), Prediction.id.desc())]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 22, 23, 50])
+def test_pages_cover_every_row_once_in_order(app, limit):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = _page(Prediction.query, cursor, limit)
+        assert len(rows) <= limit
+        seen += [p.id for p in rows]
+        if cursor is None:
+            break
+        assert len(rows) == limit
+
+    assert seen == newest_first(Prediction.query)
+
+
+def test_pages_follow_filters(app):
+    query = Prediction.query.filter_by(user_id=2)
+
+    first, cursor = _page(query, limit=6)
+    second, cursor = _page(query, cursor, limit=6)
+
+    assert [p.id for p in first + second] == newest_first(query)
+    assert cursor is None
+
+
+def test_cursor_names_the_last_row(app):
+    rows, cursor = _page(Prediction.query, limit=4)
+    assert cursor == f"{rows[-1].timestamp.isoformat()}|{rows[-1].id}"
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "2026-01-01T12:00:00", "2026-01-01T12:00:00|x", "not-a-date|3"])
+def test_malformed_cursor_is_a_bad_request(app, cursor):
+    with pytest.raises(BadRequest):
+        _page(Prediction.query, cursor)
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from backend import database, jobs
+from backend.database import db
+from backend.models import Job
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'jobs.db'}"
+    app.config["UPLOAD_FOLDER"] = str(tmp_path / "uploads")
+    app.config["JOB_WORKERS"] = 0
+    database.init_app(app)
+    jobs.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    """Job ids handed to run_job (inline dispatch), instead of running them."""
+    ids = []
+    monkeypatch.setattr(jobs, "run_job", lambda app, job_id: ids.append(job_id))
+    return ids
+
+
+def add_job(app, tmp_path, name, spooled=True, **columns):
+    path = tmp_path / name
+    if spooled:
+        path.write_text("gene,value\n")
+    with app.app_context():
+        job = Job(filename=name, path=str(path), **columns)
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def status(app, job_id):
+    with app.app_context():
+        return db.session.get(Job, job_id).status
+
+
+def test_only_expired_leases_are_taken_over(app, tmp_path, dispatched):
+    now = datetime.utcnow()
+    expired = now - timedelta(seconds=2 * jobs.JOB_LEASE_SECONDS)
+    alive = add_job(app, tmp_path, "alive.csv", status="running", owner="web-2:11", heartbeat_at=now)
+    dead = add_job(app, tmp_path, "dead.csv", status="running", owner="web-1:10", heartbeat_at=expired)
+    legacy = add_job(app, tmp_path, "legacy.csv", status="running")
+    lost = add_job(app, tmp_path, "lost.csv", spooled=False, status="running", heartbeat_at=expired)
+
+    jobs.resume_pending(app)
+
+    assert status(app, alive) == "running"
+    assert status(app, dead) == status(app, legacy) == "queued"
+    assert status(app, lost) == "failed"
+    assert dispatched == [dead, legacy]
+
+
+def test_queued_jobs_are_left_to_their_process_until_stale(app, tmp_path, dispatched):
+    fresh = add_job(app, tmp_path, "fresh.csv", status="queued")
+    stale = add_job(app, tmp_path, "stale.csv", status="queued",
+                    created_at=datetime.utcnow() - timedelta(seconds=2 * jobs.JOB_LEASE_SECONDS))
+
+    jobs.resume_pending(app)
+    assert dispatched == [stale]
+
+    # At startup every queued job is (re)submitted; claiming keeps runs unique
+    jobs.resume_pending(app, every_queued=True)
+    assert dispatched == [stale, fresh, stale]
+
+
+def test_claim_takes_a_lease(app, tmp_path):
+    job_id = add_job(app, tmp_path, "a.csv", status="queued")
+
+    with app.app_context():
+        assert jobs._claim(job_id)
+        assert not jobs._claim(job_id)
+        job = db.session.get(Job, job_id)
+        assert job.owner == jobs._owner()
+        assert job.heartbeat_at is not None
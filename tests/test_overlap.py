@@ -0,0 +1,47 @@
+from backend.prediction import overlap
+
+# 25 features: the last byte of the bitset is padding
+FEATURES = {
+    "breast": ["BRCA1", "BRCA2", "TP53", "ESR1", "ERBB2", "GATA3", "KRT5", "FOXA1", "PGR"],
+    "ovarian": ["BRCA1", "PAX8", "WT1", "MUC16", "CA125"],
+    "lung": ["EGFR", "KRAS", "ALK", "TP53", "STK11", "NKX2-1", "SFTPC", "NAPSA", "ROS1", "MET", "KEAP1"],
+}
+
+
+def test_round_trip_keeps_feature_order():
+    shared = {
+        "breast": ["PGR", "BRCA1", "TP53"],
+        "ovarian": ["MUC16"],
+        "lung": ["KEAP1", "EGFR", "TP53", "ALK"],
+    }
+    decoded = overlap.decode(overlap.encode(shared, FEATURES), FEATURES)
+
+    assert decoded == {
+        "breast": ["BRCA1", "TP53", "PGR"],
+        "ovarian": ["MUC16"],
+        "lung": ["EGFR", "ALK", "TP53", "KEAP1"],
+    }
+
+
+def test_missing_diseases_and_unknown_genes():
+    shared = {"lung": ["EGFR", "NOT_A_FEATURE"]}
+    decoded = overlap.decode(overlap.encode(shared, FEATURES), FEATURES)
+
+    assert decoded == {"breast": [], "ovarian": [], "lung": ["EGFR"]}
+
+
+def test_all_and_none():
+    every = overlap.decode(overlap.encode(FEATURES, FEATURES), FEATURES)
+    assert every == FEATURES
+
+    nothing = overlap.decode(overlap.encode({}, FEATURES), FEATURES)
+    assert nothing == {d: [] for d in FEATURES}
+
+
+def test_vocabulary_version_is_stable():
+    version = overlap.vocabulary_version(FEATURES)
+
+    assert len(version) == 16
+    assert overlap.vocabulary_version({d: list(g) for d, g in FEATURES.items()}) == version
+    assert overlap.vocabulary_version({**FEATURES, "lung": FEATURES["lung"][::-1]}) != version
+    assert overlap.vocabulary_version({d: FEATURES[d] for d in reversed(FEATURES)}) != version
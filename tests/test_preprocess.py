@@ -0,0 +1,114 @@
+import gzip
+import io
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from backend.prediction import preprocess
+from backend.prediction.alignment import GeneVocabulary
+from backend.prediction.probes import ProbeIndex
+
+NaN = np.nan
+
+# Every upload is aligned onto this vocabulary; expected vectors follow its order
+GENES = ["BRCA1", "TP53", "EGFR", "KRAS"]
+
+# 1007_s_at -> BRCA1, 201_at -> TP53 + EGFR, 202_at -> a gene outside the vocabulary
+PROBES = ProbeIndex(["1007_s_at", "201_at", "202_at"], [0, 1, 3, 4], [0, 1, 2, 3],
+                    ["BRCA1", "TP53", "EGFR", "UNRELATED"])
+
+
+@pytest.fixture(autouse=True)
+def fixed_vocabulary(monkeypatch):
+    vocab = GeneVocabulary(GENES)
+    monkeypatch.setattr(preprocess, "get_vocab", lambda: vocab)
+    monkeypatch.setattr(preprocess, "get_probe_index", lambda: PROBES)
+
+
+def upload(filename, text):
+    data = text.encode("utf-8")
+    if filename.endswith(".gz"):
+        data = gzip.compress(data)
+    return FileStorage(stream=io.BytesIO(data), filename=filename)
+
+
+def aligned_values(aligned):
+    """Aligned rows without the trailing padding slot."""
+    return aligned.values[:, :len(GENES)]
+
+
+# ============================================================
+# Single-sample uploads
+# ============================================================
+SINGLE = [
+    # Case A: one wide row
+    ("wide comma", "s.csv", "BRCA1,TP53,FOO\n1.5,2,9\n", [1.5, 2, 0, 0]),
+    ("wide tab", "s.tsv", "BRCA1\tTP53\tEGFR\n1\t2\t3\n", [1, 2, 3, 0]),
+    ("wide semicolon", "s.txt", "BRCA1;KRAS\n4;5\n", [4, 0, 0, 5]),
+    ("wide padded header", "s.csv", "BRCA1, TP53 ,EGFR\n1,2,3\n", [1, 2, 3, 0]),
+    ("wide BOM", "s.csv", "\ufeffBRCA1,TP53\n1,2\n", [1, 2, 0, 0]),
+    ("wide CRLF", "s.csv", "BRCA1,TP53\r\n1,2\r\n", [1, 2, 0, 0]),
+    ("wide gz", "s.tsv.gz", "TP53\tKRAS\n7\t8\n", [0, 7, 0, 8]),
+    # Case B: gene / value rows
+    ("long comma", "l.csv", "gene,value\nBRCA1,1.5\nTP53,2\nFOO,3\n", [1.5, 2, 0, 0]),
+    ("long padded header", "l.csv", "gene, value\nBRCA1,1.5\nTP53,2\n", [1.5, 2, 0, 0]),
+    ("long BOM", "l.csv", "\ufeffgene,value\nBRCA1,1\nEGFR,3\n", [1, 0, 3, 0]),
+    ("long quoted", "l.csv", '"Gene","TPM"\n"BRCA1","1.5"\n"TP53",2\n', [1.5, 2, 0, 0]),
+    ("long NaN rows", "l.tsv", "gene\tvalue\nBRCA1\t\nTP53\t2\nEGFR\tNA\n", [0, 2, 0, 0]),
+    ("long semicolon CRLF", "l.txt", "symbol;expression\r\nKRAS;6\r\nTP53;1\r\n", [0, 1, 0, 6]),
+    ("long gz", "l.txt.gz", "gene\tvalue\nBRCA1\t1\nKRAS\t2\n", [1, 0, 0, 2]),
+    # Microarray rows with gene symbols; "genesymbol" + "intensity" read as
+    # gene / value rows, first value per gene (as on baseline)
+    ("microarray", "m.txt", "probe_id\tgenesymbol\tintensity\n1\tBRCA1\t1\n2\tBRCA1\t3\n3\tTP53\t5\n", [1, 5, 0, 0]),
+    # Case D: raw probe IDs (GEO GSM table)
+    ("probe table", "g.txt", "ID_REF\tVALUE\n1007_s_at\t4\n201_at\t6\n202_at\t1\n999_at\t1\n", [4, 6, 6, 0]),
+]
+
+
+@pytest.mark.parametrize("filename, text, expected", [c[1:] for c in SINGLE], ids=[c[0] for c in SINGLE])
+def test_preprocess_data(filename, text, expected):
+    aligned = preprocess.preprocess_data(upload(filename, text))
+
+    np.testing.assert_array_equal(aligned_values(aligned), np.asarray([expected], dtype=np.float32))
+
+
+@pytest.mark.parametrize("filename, text, error", [
+    ("s.csv", "", "no data"),
+    ("s.csv", "\ufeff\n\n", "no data"),
+    ("s.csv", "FOO,BAR\n1,2\n", "No matching genes"),
+    ("s.pdf", "BRCA1\n1\n", "Allowed formats"),
+])
+def test_preprocess_data_rejects(filename, text, error):
+    with pytest.raises(ValueError, match=error):
+        preprocess.preprocess_data(upload(filename, text))
+
+
+# ============================================================
+# Cohorts
+# ============================================================
+COHORTS = [
+    ("genes x samples", "c.txt",
+     "!Series_title\t\"demo\"\ngene\tS1\tS2\nBRCA1\t1\t2\nTP53\t3\t4\nFOO\t5\t6\n",
+     ["S1", "S2"], [[1, 3, 0, 0], [2, 4, 0, 0]]),
+    ("genes x samples BOM CRLF NaN", "c.csv",
+     "\ufeffgene,S1,S2\r\nBRCA1,1,\r\nTP53,3,4\r\n",
+     ["S1", "S2"], [[1, 3, 0, 0], [NaN, 4, 0, 0]]),
+    ("samples x genes", "c.csv",
+     "sample,BRCA1,TP53,EGFR\nA,1,2,3\nB,4,5,6\n",
+     ["A", "B"], [[1, 2, 3, 0], [4, 5, 6, 0]]),
+    ("samples x genes semicolon quoted padded", "c.txt",
+     '"id";" BRCA1";"KRAS "\n"A";1;2\n"B";3;4\n',
+     ["A", "B"], [[1, 0, 0, 2], [3, 0, 0, 4]]),
+    ("probes x samples gz", "c.txt.gz",
+     "ID_REF\tGSM1\tGSM2\n1007_s_at\t1\t2\n201_at\t3\t4\n",
+     ["GSM1", "GSM2"], [[1, 3, 3, 0], [2, 4, 4, 0]]),
+]
+
+
+@pytest.mark.parametrize("filename, text, samples, expected", [c[1:] for c in COHORTS], ids=[c[0] for c in COHORTS])
+def test_preprocess_cohort(filename, text, samples, expected):
+    aligned = preprocess.preprocess_cohort(upload(filename, text))
+
+    np.testing.assert_array_equal(aligned_values(aligned), np.asarray(expected, dtype=np.float32))
+    assert aligned.samples == samples
@@ -0,0 +1,151 @@
+import json
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from backend.prediction.registry import MODEL_FILES, ModelRegistry, publish, read_manifest
+
+
+def write_version(directory, seed):
+    """A model set in ``directory``: tiny forests named like MODEL_FILES, each on its own genes."""
+    directory.mkdir()
+    rng = np.random.default_rng(seed)
+    for i, (model_file, gene_file) in enumerate(MODEL_FILES.values()):
+        genes = [f"GENE{i}_{j}" for j in range(6)]
+        X = pd.DataFrame(rng.normal(size=(60, len(genes))), columns=genes)
+        y = (X.iloc[:, 0] > 0).astype(int)
+        forest = RandomForestClassifier(n_estimators=4, max_depth=3, random_state=seed).fit(X, y)
+        joblib.dump(forest, directory / model_file)
+        (directory / gene_file).write_text(json.dumps(genes))
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    write_version(tmp_path / "v1", seed=1)
+    write_version(tmp_path / "v2", seed=2)
+    path = tmp_path / "manifest.json"
+    publish("v1", "v1", manifest_path=path)
+    return path
+
+
+@pytest.fixture
+def registry(manifest):
+    # reload_seconds=0: versions only change when a test calls reload()
+    return ModelRegistry(model_dir=manifest.parent / "v1", mmap_mode=None, bundle_path=None,
+                         manifest_path=manifest, reload_seconds=0)
+
+
+def test_manifest_round_trip(manifest):
+    current, specs = read_manifest(manifest)
+    assert current == "v1"
+    assert set(specs) == {"v1"}
+    assert specs["v1"].model_dir == (manifest.parent / "v1").resolve()
+
+    publish("v2", "v2", manifest_path=manifest)
+    current, specs = read_manifest(manifest)
+    assert (current, set(specs)) == ("v2", {"v1", "v2"})
+
+
+def test_publish_rejects_incomplete_versions(manifest):
+    (manifest.parent / "empty").mkdir()
+    with pytest.raises(ValueError):
+        publish("empty", "empty", manifest_path=manifest)
+    with pytest.raises(ValueError):
+        publish("unknown", manifest_path=manifest)
+
+
+def test_reload_swaps_to_the_published_version(registry, manifest):
+    v1 = registry.current()
+    assert v1.version == "v1"
+    assert registry.reload(wait=True) is v1
+
+    publish("v2", "v2", manifest_path=manifest)
+    v2 = registry.reload(wait=True)
+
+    assert v2.version == "v2"
+    assert registry.current() is v2
+    assert v1.retired and not v1.is_loaded("breast")
+
+    publish("v1", manifest_path=manifest)
+    assert registry.reload(wait=True).version == "v1"
+
+
+def test_pinned_version_outlives_the_swap(registry, manifest):
+    v1 = registry.acquire()
+    v1.load()
+    assert v1.refs == 1
+
+    publish("v2", "v2", manifest_path=manifest)
+    registry.reload(wait=True)
+
+    # Replaced but still in use: kept loaded, and still what the pin sees
+    assert v1.retired and v1.is_loaded("breast")
+    with registry.use(v1):
+        assert registry.version() == "v1"
+        assert registry.get("breast").model is v1.get("breast").model
+    assert registry.version() == "v2"
+
+    registry.release(v1)
+    assert v1.refs == 0
+    assert not v1.is_loaded("breast")
+
+
+def test_use_pins_once_per_context(registry):
+    with registry.use() as outer:
+        with registry.use() as inner:
+            assert inner is outer
+            assert outer.refs == 1
+    assert outer.refs == 0
+    assert not outer.retired
+
+
+def test_failed_version_keeps_the_current_one(registry, manifest):
+    v1 = registry.current()
+    (manifest.parent / "broken").mkdir()
+    for model_file, gene_file in MODEL_FILES.values():
+        (manifest.parent / "broken" / model_file).write_bytes(b"not a pickle")
+        (manifest.parent / "broken" / gene_file).write_text("[]")
+
+    publish("broken", "broken", manifest_path=manifest)
+    assert registry.reload(wait=True) is v1
+    assert not v1.retired
+
+    # Not retried until another version is published
+    assert registry.reload(wait=True) is v1
+    publish("v2", "v2", manifest_path=manifest)
+    assert registry.reload(wait=True).version == "v2"
+
+
+def test_refcounts_balance_under_concurrent_swaps(registry, manifest):
+    publish("v2", "v2", manifest_path=manifest)
+    seen, unpinned, stop = [], [], threading.Event()
+
+    def worker():
+        while not stop.is_set():
+            with registry.use() as version:
+                version.get("breast")
+                # Never released while pinned, however many swaps happen meanwhile
+                if version.refs < 1 or not version.is_loaded("breast"):
+                    unpinned.append(version)
+                seen.append(version)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for i in range(6):
+        publish("v1" if i % 2 else "v2", manifest_path=manifest)
+        registry.reload(wait=True)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    assert not unpinned
+    current = registry.current()
+    for version in set(seen):
+        assert version.refs == 0
+        if version is not current:
+            assert version.retired and not version.is_loaded("breast")
@@ -0,0 +1,83 @@
+import json
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from backend.prediction import training
+from backend.prediction.registry import MODEL_FILES, ModelRegistry, read_manifest
+from tests.test_registry import write_version
+
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    """Manifest-less model directory (the implicit version) and an empty stage cache."""
+    monkeypatch.setattr(training, "TRAIN_CACHE_DIR", tmp_path / "training")
+    monkeypatch.setattr(training, "METRICS_DIR", tmp_path / "metrics")
+    write_version(tmp_path / "models", seed=1)
+    return tmp_path / "models"
+
+
+def trained(disease, key, seed):
+    """A ``train`` result whose fitted model sits in the stage cache under ``key``."""
+    genes = [f"{disease.upper()}_{j}" for j in range(5)]
+    X = pd.DataFrame(np.random.default_rng(seed).normal(size=(40, len(genes))), columns=genes)
+    model = RandomForestClassifier(n_estimators=3, max_depth=3, random_state=seed).fit(X, X.iloc[:, 1] > 0)
+
+    path = training._stage_path("model", key, ".pkl")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, path, compress=0)
+    return {"disease": disease, "model": key, "genes": genes}
+
+
+def publish(results, models, force=False):
+    return training.publish(results, force, model_dir=models, manifest_path=models / "manifest.json")
+
+
+def test_publishes_a_complete_version(models):
+    lung = trained("lung", "lung-1", seed=3)
+    version = publish([lung], models)
+
+    current, specs = read_manifest(models / "manifest.json")
+    assert current == version
+    directory = specs[version].model_dir
+    assert directory == (models / training.TRAINED_DIR / version).resolve()
+    assert not list(directory.parent.glob(".*.tmp"))
+
+    # Retrained disease from the stage cache, the others copied unchanged
+    lung_model, lung_genes = MODEL_FILES["lung"]
+    assert json.loads((directory / lung_genes).read_text()) == lung["genes"]
+    assert (directory / "lung_balanced_model_compact.npz").exists()
+    for disease in ("breast", "ovarian"):
+        for name in MODEL_FILES[disease]:
+            assert (directory / name).read_bytes() == (models / name).read_bytes()
+
+    served = ModelRegistry(model_dir=models, mmap_mode=None, bundle_path=None,
+                           manifest_path=models / "manifest.json", reload_seconds=0).current()
+    assert served.version == version
+    assert list(served.get("lung").model.feature_names_in_) == lung["genes"]
+
+
+def test_unchanged_models_are_not_republished(models):
+    lung = trained("lung", "lung-1", seed=3)
+    version = publish([lung], models)
+
+    assert publish([lung], models) is None
+    assert publish([lung], models, force=True) == version
+
+
+def test_later_versions_build_on_the_current_one(models):
+    first = publish([trained("lung", "lung-1", seed=3)], models)
+    second = publish([trained("breast", "breast-1", seed=4)], models)
+
+    assert second != first
+    current, specs = read_manifest(models / "manifest.json")
+    assert current == second and set(specs) == {first, second}
+
+    record = json.loads((specs[second].model_dir / training.TRAINING_KEYS_FILE).read_text())
+    assert record["models"] == {"breast": "breast-1", "lung": "lung-1", "ovarian": None}
+    assert record["base"].startswith("files-")
+    lung_model = MODEL_FILES["lung"][0]
+    assert (specs[second].model_dir / lung_model).read_bytes() == (specs[first].model_dir / lung_model).read_bytes()